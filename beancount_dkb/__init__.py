@@ -1,3 +1,33 @@
-from .credit import CreditImporter  # NOQA
-from .ec import ECImporter  # NOQA
+import importlib
+from typing import TYPE_CHECKING
+
 from .exceptions import InvalidFormatError  # NOQA
+
+if TYPE_CHECKING:
+    from .credit import CreditImporter  # NOQA
+    from .ec import ECImporter  # NOQA
+
+# The importers are only imported when they're first used, so that importing the
+# package (or a single importer) doesn't load more than necessary
+_LAZY_ATTRIBUTES = {
+    "CreditImporter": ".credit",
+    "ECImporter": ".ec",
+}
+
+__all__ = ["CreditImporter", "ECImporter", "InvalidFormatError"]
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
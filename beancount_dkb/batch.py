@@ -0,0 +1,177 @@
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+from beancount.core import data
+from beangulp.importer import Importer
+
+from .conflicts import ConflictReport
+from .registry import ImporterRegistry
+from .stats import FileStats
+
+
+class BatchResult(NamedTuple):
+    filepath: str
+    # index into the importers passed to extract_many(), None if no importer
+    # identified the file
+    importer_index: Optional[int]
+    account: Optional[str]
+    entries: data.Entries
+    error: Optional[str]
+    # time spent identifying and extracting the file
+    seconds: float = 0.0
+    # what the importer collected while extracting the file in a worker process,
+    # which extract_many() adds to the stats and conflicts of its importer
+    file_stats: tuple[FileStats, ...] = ()
+    conflicts: Optional[ConflictReport] = None
+
+    @property
+    def rows(self) -> int:
+        """
+        The number of directives extracted from transaction rows, which is all of
+        them except the closing balance
+        """
+
+        return max(len(self.entries) - 1, 0)
+
+
+# Set up once per worker process by _init_worker(), so the importers (and their
+# compiled matchers) are shipped and rebuilt once per worker instead of per file
+_importers: Sequence[Importer] = ()
+_registry: Optional[ImporterRegistry] = None
+
+
+def _init_worker(importers: Sequence[Importer]) -> None:
+    global _importers, _registry
+
+    _importers = importers
+    _registry = ImporterRegistry(importers)
+
+    # the copies start out with whatever the importers had collected so far, which
+    # the parent process has already
+    for importer in importers:
+        _take_collected(importer)
+
+
+def _take_collected(importer: Importer) -> dict:
+    """
+    Return the stats and conflicts the importer collected, and reset them
+    """
+
+    collected = {}
+
+    stats = getattr(importer, "stats", None)
+
+    if stats is not None:
+        collected["file_stats"] = tuple(stats.files)
+        stats.clear()
+
+    conflicts = getattr(importer, "conflicts", None)
+
+    if conflicts is not None:
+        if len(conflicts):
+            collected["conflicts"] = conflicts
+
+        importer.conflicts = ConflictReport(conflicts.max_samples)
+
+    return collected
+
+
+def _extract_in_worker(filepath: str) -> BatchResult:
+    result = _extract_path(filepath, _importers, _registry)
+
+    if result.importer_index is None:
+        return result
+
+    return result._replace(**_take_collected(_importers[result.importer_index]))
+
+
+def _merge_collected(importers: Sequence[Importer], result: BatchResult) -> None:
+    if result.importer_index is None:
+        return
+
+    importer = importers[result.importer_index]
+
+    if result.file_stats:
+        importer.stats.files.extend(result.file_stats)
+
+    if result.conflicts is not None:
+        importer.conflicts.update(result.conflicts)
+
+
+def _extract_path(
+    filepath: str, importers: Sequence[Importer], registry: ImporterRegistry
+) -> BatchResult:
+    importer_index = None
+    account = None
+
+    start = perf_counter()
+
+    try:
+        importer = registry.importer_for(filepath)
+
+        if importer is None:
+            return BatchResult(filepath, None, None, [], None, perf_counter() - start)
+
+        importer_index = next(
+            index for index, other in enumerate(importers) if other is importer
+        )
+        account = importer.account(filepath)
+        entries = importer.extract(filepath, [])
+
+        return BatchResult(
+            filepath, importer_index, account, entries, None, perf_counter() - start
+        )
+    except Exception as exc:
+        return BatchResult(
+            filepath,
+            importer_index,
+            account,
+            [],
+            f"{type(exc).__name__}: {exc}",
+            perf_counter() - start,
+        )
+
+
+def extract_many(
+    importers: Sequence[Importer],
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+) -> list[BatchResult]:
+    """
+    Identify and extract many files in parallel
+
+    Every file is handed to the importer configured for its IBAN or card number (see
+    ImporterRegistry) in one of the worker processes. Results are returned in the
+    order of the given paths. A file which can't be read or parsed doesn't stop the
+    batch, instead the error is reported in its result.
+
+    workers defaults to the number of processors. With workers=1, the files are
+    extracted one after the other in the current process.
+
+    Worker processes extract with copies of the importers. The stats and matcher
+    conflicts they collect are added to the given importers, but their caches
+    aren't. Importers with a watermark are only supported with workers=1, since the
+    copies can't update the same store.
+    """
+
+    importers = list(importers)
+    paths = [str(path) for path in paths]
+
+    if workers == 1:
+        registry = ImporterRegistry(importers)
+
+        return [_extract_path(filepath, importers, registry) for filepath in paths]
+
+    if any(getattr(importer, "watermark", None) is not None for importer in importers):
+        raise ValueError("Importers with a watermark can only be used with workers=1")
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(importers,)
+    ) as executor:
+        results = list(executor.map(_extract_in_worker, paths))
+
+    for result in results:
+        _merge_collected(importers, result)
+
+    return results
@@ -0,0 +1,233 @@
+import hashlib
+import os
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable, NamedTuple, Optional
+
+from .helpers import atomic_write
+
+# Bumped whenever the layout of the values stored by the importers changes
+_DISK_CACHE_FORMAT = 1
+
+
+class FileKey(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    content_hash: Optional[str]
+
+
+def hash_file(filepath: str, chunk_size: int = 1 << 16) -> str:
+    digest = hashlib.sha256()
+
+    with open(filepath, "rb") as fd:
+        for chunk in iter(lambda: fd.read(chunk_size), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def file_key(filepath: str, hash_content: bool = False) -> FileKey:
+    """
+    Build a key identifying the current contents of a file
+
+    By default only the file metadata is considered, which is cheap but can miss
+    changes that preserve size and modification time. Setting hash_content also
+    includes a hash of the file contents in the key.
+    """
+
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+
+    return FileKey(
+        path,
+        stat.st_size,
+        stat.st_mtime_ns,
+        stat.st_ino,
+        hash_file(path) if hash_content else None,
+    )
+
+
+def config_fingerprint(config: Hashable) -> str:
+    """
+    Hash an importer's configuration, given as a tuple of plain values
+
+    The version of this package is part of the fingerprint, so that upgrading it
+    (which may change what is extracted) doesn't serve outdated results.
+    """
+
+    digest = hashlib.sha256()
+    digest.update(repr((_DISK_CACHE_FORMAT, _package_version(), config)).encode())
+
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _package_version() -> str:
+    # importlib.metadata takes a while to import, and is only needed with a disk
+    # cache
+    from importlib import metadata
+
+    try:
+        return metadata.version("beancount-dkb")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def relocate_entries(entries, filepath: str):
+    """
+    Copy entries like copy_entries(), pointing their filename at filepath
+
+    Entries loaded from the disk cache may have been extracted from a copy of the
+    file at another path.
+    """
+
+    return [
+        _copy_entry(entry, {**entry.meta, "filename": filepath}) for entry in entries
+    ]
+
+
+def copy_entries(entries):
+    """
+    Shallow copy directives, giving each one its own metadata dictionary and list
+    of postings
+
+    Callers (e.g. beangulp marking duplicates) are free to modify the metadata and
+    postings of the entries they are handed, which must not leak back into cached
+    entries.
+    """
+
+    return [_copy_entry(entry, dict(entry.meta)) for entry in entries]
+
+
+def _copy_entry(entry, meta: dict):
+    if hasattr(entry, "postings"):
+        return entry._replace(meta=meta, postings=list(entry.postings))
+
+    return entry._replace(meta=meta)
+
+
+class ExtractionCache:
+    """
+    Bounded LRU cache for results computed from the contents of a file
+
+    The cache can be shared between threads extracting different files.
+    """
+
+    def __init__(self, maxsize: int = 16, hash_content: bool = False):
+        self.maxsize = maxsize
+        self.hash_content = hash_content
+
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, filepath: str) -> FileKey:
+        return file_key(filepath, self.hash_content)
+
+    def stat_key(self, filepath: str) -> FileKey:
+        """
+        Like key(), but never hashing the file contents
+
+        For results that only need a small part of the file, where hashing all of
+        it would cost more than computing the result again.
+        """
+
+        return file_key(filepath)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                return None
+
+            self._entries.move_to_end(key)
+
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __getstate__(self) -> dict:
+        # cached results can be large, so a copy (e.g. sent to a worker process)
+        # starts out empty
+        state = self.__dict__.copy()
+        state["_entries"] = OrderedDict()
+        del state["_lock"]
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    Persistent cache for extraction results, stored as files in a directory
+
+    Results are keyed on a hash of the file contents and a fingerprint of the
+    importer's configuration, so an unchanged file is only parsed again after the
+    configuration changed. Each result is pickled and compressed into its own file.
+
+    Entries are never expired, but the directory is safe to delete at any time.
+    Results are loaded with pickle, so only use a directory that nobody else can
+    write to.
+    """
+
+    def __init__(self, directory: str, compression_level: int = 6):
+        self.directory = directory
+        self.compression_level = compression_level
+
+    def _path(self, content_hash: str, fingerprint: str) -> str:
+        name = hashlib.sha256(f"{content_hash}:{fingerprint}".encode()).hexdigest()
+
+        return os.path.join(self.directory, name[:2], f"{name}.pickle.z")
+
+    def get(self, content_hash: str, fingerprint: str) -> Optional[Any]:
+        try:
+            with open(self._path(content_hash, fingerprint), "rb") as fd:
+                return pickle.loads(zlib.decompress(fd.read()))
+        except Exception:
+            # missing, corrupt or outdated entries are all treated as misses, and
+            # written again once the file was extracted
+            return None
+
+    def set(self, content_hash: str, fingerprint: str, value: Any) -> None:
+        path = self._path(content_hash, fingerprint)
+        directory = os.path.dirname(path)
+
+        os.makedirs(directory, exist_ok=True)
+
+        content = zlib.compress(
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+            self.compression_level,
+        )
+
+        # concurrent readers never see a half written entry
+        atomic_write(path, content)
+
+    def clear(self) -> None:
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".pickle.z"):
+                    os.unlink(os.path.join(root, filename))
@@ -0,0 +1,243 @@
+"""
+Convert DKB exports to beancount files, one per account
+
+    beancount-dkb --config accounts.json --output-dir ledger/ exports/
+    beancount-dkb -c accounts.json -o ledger/ "exports/**/*.csv"
+
+The config file is a JSON list with one object per account. Objects with an "iban"
+create an ECImporter, objects with a "card_number" a CreditImporter. "account" is
+the account name, and any other keys are passed on to the importer as keyword
+arguments:
+
+    [
+        {
+            "iban": "DE99 9999 9999 9999 9999 99",
+            "account": "Assets:DKB:EC",
+            "payee_patterns": [["REWE", "Expenses:Supermarket:REWE"]]
+        },
+        {"card_number": "1234 •••• •••• 5678", "account": "Liabilities:DKB:Visa"}
+    ]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from time import perf_counter
+from typing import Optional, Sequence
+
+from beancount.core import data
+from beancount.parser import printer
+
+from .batch import BatchResult, extract_many
+from .cache import DiskCache
+from .credit import CreditImporter
+from .ec import ECImporter
+from .merge import merge_directives
+
+_GLOB_CHARACTERS = frozenset("*?[")
+
+
+def load_importers(filepath: str, disk_cache: Optional[DiskCache] = None) -> list:
+    """
+    Create the importers configured in a JSON config file
+
+    Raises ValueError if the config is invalid.
+    """
+
+    with open(filepath, encoding="utf-8") as fd:
+        config = json.load(fd)
+
+    if not isinstance(config, list):
+        raise ValueError("The config must be a list of accounts")
+
+    importers = []
+
+    for index, options in enumerate(config):
+        if not isinstance(options, dict) or "account" not in options:
+            raise ValueError(f"Entry {index} must be an object with an account")
+
+        options = dict(options)
+        account = options.pop("account")
+
+        if "iban" in options:
+            importer_class = ECImporter
+        elif "card_number" in options:
+            importer_class = CreditImporter
+        else:
+            raise ValueError(f"Entry {index} needs either an iban or a card_number")
+
+        if disk_cache is not None:
+            options.setdefault("disk_cache", disk_cache)
+
+        try:
+            importers.append(importer_class(account_name=account, **options))
+        except TypeError as exc:
+            raise ValueError(f"Entry {index}: {exc}") from exc
+
+    return importers
+
+
+def find_exports(patterns: Sequence[str]) -> list[str]:
+    """
+    Expand files, directories (searched recursively for CSV files) and glob
+    patterns into a sorted list of files, without duplicates
+    """
+
+    paths = set()
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(
+                glob.glob(os.path.join(pattern, "**", "*.csv"), recursive=True)
+            )
+        elif _GLOB_CHARACTERS.intersection(pattern):
+            paths.update(
+                path
+                for path in glob.glob(pattern, recursive=True)
+                if os.path.isfile(path)
+            )
+        else:
+            paths.add(pattern)
+
+    return sorted(paths)
+
+
+def output_filename(account: str) -> str:
+    return account.replace(":", "-") + ".beancount"
+
+
+def write_accounts(results: Sequence[BatchResult], output_dir: str) -> list[str]:
+    """
+    Write the entries of every account to its own file, sorted by date
+
+    The exports of an account usually overlap, so they are merged with
+    merge_directives() first, which drops the rows contained in more than one of
+    them and keeps the closing balance of the most recent export only. The entries
+    are in memory already, so every row is compared with every other, however far
+    out of order they are.
+
+    Returns the paths of the written files.
+    """
+
+    exports_by_account: dict[str, list[data.Entries]] = {}
+
+    for result in results:
+        if result.account is not None and result.error is None:
+            exports_by_account.setdefault(result.account, []).append(result.entries)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    written = []
+
+    for account, exports in sorted(exports_by_account.items()):
+        filepath = os.path.join(output_dir, output_filename(account))
+        entries = sorted(
+            merge_directives(exports, window_days=None), key=data.entry_sortkey
+        )
+
+        with open(filepath, "w", encoding="utf-8") as fd:
+            printer.print_entries(entries, file=fd)
+
+        written.append(filepath)
+
+    return written
+
+
+def _rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:,.1f}" if seconds > 0 else "-"
+
+
+def print_report(results: Sequence[BatchResult], seconds: float, file=None) -> None:
+    file = file or sys.stdout
+
+    extracted = [
+        result
+        for result in results
+        if result.account is not None and result.error is None
+    ]
+    rows = sum(result.rows for result in extracted)
+
+    print(f"{'file':<50} {'account':<30} {'rows':>8} {'ms':>10}", file=file)
+
+    for result in results:
+        if result.error is not None:
+            status = f"error: {result.error}"
+        elif result.account is None:
+            status = "not a known DKB export"
+        else:
+            status = None
+
+        if status is None:
+            print(
+                f"{result.filepath:<50} {result.account:<30} {result.rows:>8} "
+                f"{result.seconds * 1000:>10.2f}",
+                file=file,
+            )
+        else:
+            print(f"{result.filepath:<50} {status}", file=file)
+
+    print(
+        f"\n{len(extracted)} of {len(results)} files, {rows} rows in {seconds:.2f}s: "
+        f"{_rate(rows, seconds)} rows/s, {_rate(len(extracted), seconds)} files/s",
+        file=file,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="beancount-dkb",
+        description="Convert DKB CSV exports to beancount files, one per account",
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="export files, directories or glob patterns"
+    )
+    parser.add_argument(
+        "-c", "--config", required=True, help="JSON file configuring the accounts"
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        required=True,
+        help="directory to write a .beancount file per account to",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of processors)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="directory to keep extracted entries in, for unchanged files",
+    )
+
+    args = parser.parse_args(argv)
+
+    try:
+        importers = load_importers(
+            args.config,
+            DiskCache(args.cache_dir) if args.cache_dir is not None else None,
+        )
+    except (OSError, ValueError) as exc:
+        parser.error(f"can't load {args.config}: {exc}")
+
+    paths = find_exports(args.paths)
+
+    start = perf_counter()
+    results = extract_many(importers, paths, workers=args.workers)
+    seconds = perf_counter() - start
+
+    for filepath in write_accounts(results, args.output_dir):
+        print(f"Wrote {filepath}", file=sys.stderr)
+
+    print_report(results, seconds)
+
+    return 1 if any(result.error is not None for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
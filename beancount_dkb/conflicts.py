@@ -0,0 +1,115 @@
+import threading
+from typing import Iterator, NamedTuple, Optional, Sequence
+
+# What ECImporter does with rows matched by more than one of its matchers
+MATCHER_CONFLICT_MODES = ("warn", "report", "ignore")
+
+DEFAULT_MAX_SAMPLES = 5
+
+
+class MatcherRule(NamedTuple):
+    matcher: str
+    label: Optional[str]
+
+
+class Conflict:
+    """
+    How often a rule was picked over another one, and where
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.samples: list[tuple[str, int]] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "samples": [
+                {"filepath": filepath, "line": line} for filepath, line in self.samples
+            ],
+        }
+
+
+class ConflictReport:
+    """
+    Rows matched by more than one matcher, counted per pair of rules
+
+    Each conflict is recorded as the rule that was picked and a rule that matched
+    as well, along with the number of rows where that happened and the first
+    max_samples of them. The report can be shared between threads.
+    """
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES):
+        self.max_samples = max_samples
+
+        self._conflicts: dict[tuple[MatcherRule, MatcherRule], Conflict] = {}
+        self._lock = threading.Lock()
+
+    def add(self, filepath: str, line: int, rules: Sequence[MatcherRule]) -> None:
+        """
+        Record a row matched by all the given rules, where the first one was picked
+        """
+
+        selected, *others = rules
+
+        with self._lock:
+            for other in others:
+                conflict = self._conflicts.get((selected, other))
+
+                if conflict is None:
+                    conflict = self._conflicts[(selected, other)] = Conflict()
+
+                conflict.count += 1
+
+                if len(conflict.samples) < self.max_samples:
+                    conflict.samples.append((str(filepath), line))
+
+    def update(self, other: "ConflictReport") -> None:
+        """
+        Add the conflicts recorded in another report, e.g. by a worker process
+        """
+
+        for (selected, other_rule), other_conflict in other.items():
+            with self._lock:
+                conflict = self._conflicts.get((selected, other_rule))
+
+                if conflict is None:
+                    conflict = self._conflicts[(selected, other_rule)] = Conflict()
+
+                conflict.count += other_conflict.count
+
+                missing = self.max_samples - len(conflict.samples)
+
+                if missing > 0:
+                    conflict.samples.extend(other_conflict.samples[:missing])
+
+    def items(self) -> Iterator[tuple[tuple[MatcherRule, MatcherRule], Conflict]]:
+        with self._lock:
+            return iter(list(self._conflicts.items()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conflicts.clear()
+
+    def to_dict(self) -> list[dict]:
+        return [
+            {
+                "selected": selected._asdict(),
+                "other": other._asdict(),
+                **conflict.to_dict(),
+            }
+            for (selected, other), conflict in self.items()
+        ]
+
+    def __len__(self) -> int:
+        return len(self._conflicts)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -0,0 +1,80 @@
+import threading
+from datetime import date
+from typing import NamedTuple, Optional
+
+from beancount.core.amount import Amount
+
+from .extractors.export import ParsedExport
+
+
+class FileMetadata(NamedTuple):
+    """
+    What the metadata lines above the header say about an export
+    """
+
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    balance_amount: Optional[Amount] = None
+    balance_date: Optional[date] = None
+    closing_balance_index: int = -1
+    file_date: Optional[date] = None
+
+
+class ExtractionContext:
+    """
+    Everything that's specific to extracting a single file
+
+    Importers create one of these per call, so the importer itself (and the
+    compiled matchers it holds) can be shared between threads extracting different
+    files at the same time.
+    """
+
+    def __init__(self, filepath: str, extractor, export: ParsedExport):
+        self.filepath = filepath
+        self.extractor = extractor
+        self.export = export
+        self.metadata = FileMetadata()
+
+
+def _last_metadata_field(name: str) -> property:
+    return property(lambda self: getattr(self._last_metadata, name))
+
+
+class LastMetadataMixin:
+    """
+    Remember the metadata of the file the current thread read last
+
+    The attributes below used to be set on the importer itself. They are kept for
+    backwards compatibility, but are tracked per thread, so that threads sharing an
+    importer don't see each others files.
+    """
+
+    _date_from = _last_metadata_field("date_from")
+    _date_to = _last_metadata_field("date_to")
+    _balance_amount = _last_metadata_field("balance_amount")
+    _balance_date = _last_metadata_field("balance_date")
+    _closing_balance_index = _last_metadata_field("closing_balance_index")
+    _file_date = _last_metadata_field("file_date")
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def _last_metadata(self) -> FileMetadata:
+        return getattr(self._local, "metadata", FileMetadata())
+
+    @_last_metadata.setter
+    def _last_metadata(self, metadata: FileMetadata) -> None:
+        self._local.metadata = metadata
+
+    def __getstate__(self) -> dict:
+        # thread-local state can't be pickled, and is meaningless in another
+        # process anyway
+        state = self.__dict__.copy()
+        del state["_local"]
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
@@ -1,21 +1,43 @@
-import warnings
-from datetime import datetime, timedelta
-from textwrap import dedent
-from typing import Dict, Optional, Sequence
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
 
 from beancount.core import data, flags
 from beancount.core.amount import Amount
 from beancount.core.number import Decimal
-from beangulp.importer import Importer
 
-from .exceptions import InvalidFormatError
-from .extractors.credit import V1Extractor, V2Extractor
-from .helpers import AccountMatcher, Meta, fmt_number_de, fmt_number_en
+from .cache import DiskCache
+from .context import ExtractionContext, FileMetadata
+from .dedup import DEFAULT_WINDOW_DAYS
+from .extractors.export import DEFAULT_PREFIX_SIZE
+from .helpers import (
+    AccountMatcher,
+    Meta,
+    fmt_number_de,
+    fmt_number_en,
+    parse_date,
+)
+from .importer import DKBImporter
+
+if TYPE_CHECKING:
+    from .registry import ImporterRegistry
+    from .stats import ExtractionStats, FileStats
+    from .watermark import WatermarkStore
 
 _CREDIT_CARD_SETTLEMENT_DESCRIPTION = "ausgleich kreditkarte"
 
 
-class CreditImporter(Importer):
+def __getattr__(name: str):
+    # the extractors are only imported once an importer is created, but stay
+    # available from here
+    if name in ("V1Extractor", "V2Extractor"):
+        from .extractors import credit as extractors
+
+        return getattr(extractors, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class CreditImporter(DKBImporter):
     def __init__(
         self,
         card_number: str,
@@ -24,140 +46,148 @@ class CreditImporter(Importer):
         file_encoding: Optional[str] = None,
         description_patterns: Optional[Sequence] = None,
         ignore_credit_card_settlements: bool = False,
+        cache_size: int = 16,
+        hash_content: bool = False,
+        identify_prefix_size: int = DEFAULT_PREFIX_SIZE,
+        matcher_cache_size: Optional[int] = None,
+        stats: Optional["ExtractionStats"] = None,
+        duplicate_window_days: int = DEFAULT_WINDOW_DAYS,
+        watermark: Optional["WatermarkStore"] = None,
+        disk_cache: Optional[DiskCache] = None,
+        registry: Optional["ImporterRegistry"] = None,
     ):
+        super().__init__(
+            account_name,
+            currency,
+            file_encoding,
+            cache_size,
+            hash_content,
+            stats,
+            duplicate_window_days,
+            watermark,
+            disk_cache,
+            registry,
+        )
+
         self.card_number = card_number
-        self.account_name = account_name
-        self.currency = currency
-        self.description_matcher = AccountMatcher(description_patterns)
+        self.description_matcher = AccountMatcher(
+            description_patterns, matcher_cache_size
+        )
         self.ignore_credit_card_settlements = ignore_credit_card_settlements
 
-        self._v1_extractor = V1Extractor(card_number)
-        self._v2_extractor = V2Extractor(card_number)
-
-        self._date_from = None
-        self._date_to = None
-
-        self._file_date = None
-
-        # The balance amount is picked from the "Saldo" meta entry, and
-        # corresponds to the amount at the end of the date contained in the
-        # "Datum" meta. From the data seen so far, this date is a few days
-        # behind the end of the last date, and marks the border between
-        # "Gebucht" and "Vorgemerkt" transactions.
-        #
-        # Also, since there is no documentation on the file format, this
-        # behavior is implemented purely based on intuition, but has worked out
-        # OK so far.
-        #
-        # Beancount expects the balance amount to be from the beginning of the
-        # day, while the Tagessaldo entries in the DKB exports seem to be from
-        # the end of the day. So when setting the balance date, we add a
-        # timedelta of 1 day to the original value to make the balance
-        # assertions work.
-
-        self._balance_date = None
-        self._balance_amount = None
-        self._closing_balance_index = -1
-
-        if file_encoding is not None:
-            warnings.warn(
-                dedent(
-                    """
-                    The file_encoding parameter is no longer being used and will be
-                    removed in a future version.
-                    """
-                ),
-                DeprecationWarning,
-            )
+        from .extractors.credit import V1Extractor, V2Extractor
 
-    @property
-    def name(self):
-        return "DKB {}".format(self.__class__.__name__)
+        self._v1_extractor = V1Extractor(card_number, identify_prefix_size)
+        self._v2_extractor = V2Extractor(card_number, identify_prefix_size)
 
-    def account(self, filepath: str) -> data.Account:
-        return self.account_name
+        if registry is not None:
+            registry.register(self)
 
     def date(self, filepath: str):
-        self.extract(filepath, existing=None)
+        metadata = self._extract_meta(filepath)
 
         # in case the file contains start/end dates, return the end date
         # if not, then the file was based on a time period (Zeitraum), so we
         # return the date of the export instead
 
-        return self._date_to or self._file_date
-
-    def identify(self, filepath: str):
-        self._v1_extractor.set_filepath(filepath)
-        self._v2_extractor.set_filepath(filepath)
+        return metadata.date_to or metadata.file_date
 
-        return self._v1_extractor.identify() or self._v2_extractor.identify()
+    def _config(self) -> tuple:
+        """
+        Everything about this importer that affects extracted entries
+        """
 
-    def extract(self, filepath: str, existing: Optional[data.Entries] = None):
-        self._v1_extractor.set_filepath(filepath)
-        self._v2_extractor.set_filepath(filepath)
-
-        extractor = None
+        return (
+            type(self).__name__,
+            self.card_number,
+            self.account_name,
+            self.currency,
+            self.description_matcher.config(),
+            self.ignore_credit_card_settlements,
+        )
 
-        if self._v1_extractor.identify():
-            extractor = self._v1_extractor
-        elif self._v2_extractor.identify():
-            extractor = self._v2_extractor
-        else:
-            raise InvalidFormatError()
+    def _iter_extract(
+        self, context: ExtractionContext, file_stats: Optional["FileStats"] = None
+    ):
+        filepath = context.filepath
+        extractor = context.extractor
 
-        return self._extract(filepath, extractor)
+        # Metadata
 
-    def _extract(self, filepath, extractor):
-        entries = []
+        if file_stats is not None:
+            file_stats.resume()
 
-        line_index = 0
+        line_index = self._extract_metadata(context)
 
-        metadata_lines = extractor.extract_metadata_lines()
-        transaction_lines = extractor.extract_transaction_lines()
+        if file_stats is not None:
+            file_stats.lap("metadata")
 
-        # Metadata
+        # Transactions
 
-        metadata = {}
-        reader = extractor.csv_reader(metadata_lines)
+        lines = extractor.iter_transaction_lines(context.export)
+        rows = extractor.iter_transaction_rows(
+            context.export,
+            lines if file_stats is None else file_stats.timed(lines, "read"),
+        )
 
-        for line in reader:
-            line_index += 1
+        if file_stats is not None:
+            rows = file_stats.timed(rows, "csv")
 
-            if not line or line == [""]:
-                continue
+        row_filter = None
 
-            key, value, *_ = line
+        if self.watermark is not None:
+            from .registry import card_key
 
-            metadata[key] = Meta(value, line_index)
+            row_filter = self.watermark.row_filter(card_key(self.card_number))
 
-        self._update_meta(metadata)
+        for line in rows:
+            line_index += 1
 
-        # Transactions
+            date = extractor.get_valuation_date(line)
 
-        reader = extractor.csv_dict_reader(transaction_lines)
+            if row_filter is not None and row_filter.skip(line, date):
+                if file_stats is not None:
+                    file_stats.rows += 1
+                    file_stats.rows_skipped += 1
 
-        for line in reader:
-            line_index += 1
+                continue
 
             amount = Amount(fmt_number_de(extractor.get_amount(line)), self.currency)
 
             description = extractor.get_description(line)
 
             if self._ignore_line(description, amount):
+                if file_stats is not None:
+                    file_stats.rows += 1
+                    file_stats.rows_skipped += 1
+
                 continue
 
             meta = data.new_metadata(filepath, line_index)
 
-            date = extractor.get_valuation_date(line)
+            if file_stats is not None:
+                file_stats.rows += 1
+                file_stats.lap("parse")
 
             postings = [
                 data.Posting(self.account(filepath), amount, None, None, None, None)
             ]
 
-            if self.description_matcher.account_matches(description):
+            description_account = self.description_matcher.account_for(description)
+
+            if file_stats is not None:
+                if description_account:
+                    file_stats.count_match(
+                        "description_patterns",
+                        self.description_matcher.rule_label(description),
+                    )
+
+                file_stats.lap("matchers")
+
+            if description_account:
                 postings.append(
                     data.Posting(
-                        self.description_matcher.account_for(description),
+                        description_account,
                         None,
                         None,
                         None,
@@ -166,33 +196,36 @@ class CreditImporter(Importer):
                     )
                 )
 
-            entries.append(
-                data.Transaction(
-                    meta,
-                    date,
-                    flags.FLAG_OKAY,
-                    None,
-                    description,
-                    data.EMPTY_SET,
-                    data.EMPTY_SET,
-                    postings,
-                )
-            )
-
-        # Closing Balance
-        meta = data.new_metadata(filepath, self._closing_balance_index)
-        entries.append(
-            data.Balance(
+            transaction = data.Transaction(
                 meta,
-                self._balance_date,
-                self.account(filepath),
-                self._balance_amount,
-                None,
+                date,
+                flags.FLAG_OKAY,
                 None,
+                description,
+                data.EMPTY_SET,
+                data.EMPTY_SET,
+                postings,
             )
-        )
 
-        return entries
+            if file_stats is not None:
+                file_stats.lap("directives")
+
+            yield transaction
+
+        if row_filter is not None:
+            self.watermark.update(card_key(self.card_number), row_filter)
+
+        # Closing Balance
+        metadata = context.metadata
+
+        yield data.Balance(
+            data.new_metadata(filepath, metadata.closing_balance_index),
+            metadata.balance_date,
+            self.account(filepath),
+            metadata.balance_amount,
+            None,
+            None,
+        )
 
     def _ignore_line(self, description: str, amount: Amount) -> bool:
         if not self.ignore_credit_card_settlements:
@@ -205,13 +238,29 @@ class CreditImporter(Importer):
             and amount.number > Decimal("0")
         )
 
-    def _update_meta(self, meta: Dict[str, str]):
+    def _parse_meta(self, meta: Dict[str, Meta]) -> FileMetadata:
+        metadata = FileMetadata()
+
         for key, value in meta.items():
             if key.startswith("Von"):
-                self._date_from = datetime.strptime(value.value, "%d.%m.%Y").date()
+                metadata = metadata._replace(
+                    date_from=parse_date(value.value, "%d.%m.%Y")
+                )
             elif key.startswith("Bis"):
-                self._date_to = datetime.strptime(value.value, "%d.%m.%Y").date()
+                metadata = metadata._replace(
+                    date_to=parse_date(value.value, "%d.%m.%Y")
+                )
             elif key.startswith("Saldo"):
+                # The balance amount is picked from the "Saldo" meta entry, and
+                # corresponds to the amount at the end of the date contained in
+                # the "Datum" meta. From the data seen so far, this date is a few
+                # days behind the end of the last date, and marks the border
+                # between "Gebucht" and "Vorgemerkt" transactions.
+                #
+                # Also, since there is no documentation on the file format, this
+                # behavior is implemented purely based on intuition, but has
+                # worked out OK so far.
+
                 amount = value.value
                 if amount.startswith("--"):
                     amount = value.value.lstrip("--")
@@ -221,15 +270,29 @@ class CreditImporter(Importer):
                 formatter = (
                     fmt_number_de if key.startswith("Saldo vom") else fmt_number_en
                 )
-                self._balance_amount = Amount(
-                    Decimal(formatter(amount.split()[0])), self.currency
+                metadata = metadata._replace(
+                    balance_amount=Amount(
+                        Decimal(formatter(amount.split()[0])), self.currency
+                    ),
+                    closing_balance_index=value.line_index,
                 )
-                self._closing_balance_index = value.line_index
                 if key.startswith("Saldo vom"):
-                    self._balance_date = datetime.strptime(
-                        key.replace("Saldo vom ", "").replace(":", ""),
-                        "%d.%m.%Y",
-                    ).date()
+                    metadata = metadata._replace(
+                        balance_date=parse_date(
+                            key.replace("Saldo vom ", "").replace(":", ""),
+                            "%d.%m.%Y",
+                        )
+                    )
             elif key.startswith("Datum"):
-                self._file_date = datetime.strptime(value.value, "%d.%m.%Y").date()
-                self._balance_date = self._file_date + timedelta(days=1)
+                # Beancount expects the balance amount to be from the beginning
+                # of the day, while the Tagessaldo entries in the DKB exports
+                # seem to be from the end of the day. So when setting the
+                # balance date, we add a timedelta of 1 day to the original
+                # value to make the balance assertions work.
+
+                file_date = parse_date(value.value, "%d.%m.%Y")
+                metadata = metadata._replace(
+                    file_date=file_date, balance_date=file_date + timedelta(days=1)
+                )
+
+        return metadata
@@ -0,0 +1,99 @@
+from collections import defaultdict
+from typing import Hashable, Optional
+
+from beancount.core import data
+from beangulp.extract import DUPLICATE
+
+DEFAULT_WINDOW_DAYS = 2
+
+
+def _transaction_key(entry: data.Transaction, account: str) -> Optional[Hashable]:
+    for posting in entry.postings:
+        if posting.account == account and posting.units is not None:
+            return (posting.units.number, posting.units.currency)
+
+    return None
+
+
+def _balance_key(entry: data.Balance) -> Hashable:
+    return (entry.amount.number, entry.amount.currency)
+
+
+def mark_duplicates(
+    entries: data.Entries,
+    existing: data.Entries,
+    account: str,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+) -> None:
+    """
+    Mark the entries posting to account which are already in existing
+
+    Transactions are duplicates of existing transactions posting the same amount to
+    the same account within window_days before or after their date. Balance
+    directives are duplicates of existing balances with the same date and amount.
+    Duplicates are marked the way beangulp does it, by setting the __duplicate__
+    metadata field to the existing entry.
+
+    Instead of comparing every new entry with all the existing ones, the existing
+    entries are indexed by (amount, day), so that finding the duplicates of an entry
+    takes 2 * window_days + 1 lookups. Each existing entry is only matched once, so
+    that e.g. two identical card payments on the same day are only both marked if
+    both of them are already in the ledger. Entries are matched on their own day
+    before any of them is matched with a neighbouring day.
+    """
+
+    index: dict[Hashable, list[data.Directive]] = defaultdict(list)
+
+    for entry in existing:
+        if isinstance(entry, data.Transaction):
+            key = _transaction_key(entry, account)
+
+            if key is not None:
+                index[(data.Transaction, key, entry.date.toordinal())].append(entry)
+        elif isinstance(entry, data.Balance) and entry.account == account:
+            index[(data.Balance, _balance_key(entry), entry.date.toordinal())].append(
+                entry
+            )
+
+    if not index:
+        return
+
+    unmatched = []
+
+    for entry in entries:
+        if isinstance(entry, data.Transaction):
+            key = _transaction_key(entry, account)
+            window = window_days
+        elif isinstance(entry, data.Balance) and entry.account == account:
+            key = _balance_key(entry)
+            window = 0
+        else:
+            continue
+
+        if key is not None:
+            unmatched.append((entry, key, window))
+
+    # Match all entries on the same day first, then further away in both directions,
+    # so that an entry doesn't take the existing entry of a neighbouring day which
+    # is an exact match for another one.
+    for distance in range(window_days + 1):
+        remaining = []
+
+        for item in unmatched:
+            entry, key, window = item
+
+            if distance > window:
+                continue
+
+            day = entry.date.toordinal()
+
+            for offset in (-distance, distance) if distance else (0,):
+                candidates = index.get((type(entry), key, day + offset))
+
+                if candidates:
+                    entry.meta[DUPLICATE] = candidates.pop(0)
+                    break
+            else:
+                remaining.append(item)
+
+        unmatched = remaining
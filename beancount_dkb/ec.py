@@ -1,21 +1,48 @@
 import warnings
-from datetime import datetime, timedelta
+from datetime import timedelta
 from functools import partial
-from textwrap import dedent
-from typing import Dict, Optional, Sequence
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
 
 from beancount.core import data, flags
 from beancount.core.amount import Amount
-from beangulp.importer import Importer
 
-from .exceptions import InvalidFormatError
-from .extractors.ec import V1Extractor, V2Extractor
-from .helpers import AccountMatcher, IBANMatcher, Meta, fmt_number_de
+from .cache import DiskCache
+from .conflicts import MATCHER_CONFLICT_MODES, ConflictReport, MatcherRule
+from .context import ExtractionContext, FileMetadata
+from .dedup import DEFAULT_WINDOW_DAYS
+from .extractors.export import DEFAULT_PREFIX_SIZE
+from .helpers import AccountMatcher, IBANMatcher, Meta, fmt_number_de, parse_date
+from .importer import DKBImporter
+
+if TYPE_CHECKING:
+    from .registry import ImporterRegistry
+    from .stats import ExtractionStats, FileStats
+    from .watermark import WatermarkStore
 
 new_posting = partial(data.Posting, cost=None, price=None, flag=None, meta=None)
 
+# Matchers are tried in this order, and the first one matching a row wins
+DEFAULT_MATCHER_PRIORITY = ("iban_matcher", "payee_patterns", "description_patterns")
+
+_SELECTED_MATCHER_NAMES = {
+    "iban_matcher": "iban_matcher",
+    "payee_patterns": "payee_pattern",
+    "description_patterns": "description_pattern",
+}
+
+
+def __getattr__(name: str):
+    # the extractors are only imported once an importer is created, but stay
+    # available from here
+    if name in ("V1Extractor", "V2Extractor"):
+        from .extractors import ec as extractors
+
+        return getattr(extractors, name)
 
-class ECImporter(Importer):
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class ECImporter(DKBImporter):
     def __init__(
         self,
         iban: str,
@@ -27,130 +54,171 @@ class ECImporter(Importer):
         description_patterns: Optional[Sequence] = None,
         iban_matcher: Optional[Sequence] = None,
         normalize_payee_address_spacing: bool = False,
+        cache_size: int = 16,
+        hash_content: bool = False,
+        identify_prefix_size: int = DEFAULT_PREFIX_SIZE,
+        matcher_cache_size: Optional[int] = None,
+        stats: Optional["ExtractionStats"] = None,
+        duplicate_window_days: int = DEFAULT_WINDOW_DAYS,
+        watermark: Optional["WatermarkStore"] = None,
+        matcher_conflicts: str = "ignore",
+        matcher_priority: Sequence[str] = DEFAULT_MATCHER_PRIORITY,
+        disk_cache: Optional[DiskCache] = None,
+        registry: Optional["ImporterRegistry"] = None,
     ):
+        super().__init__(
+            account_name,
+            currency,
+            file_encoding,
+            cache_size,
+            hash_content,
+            stats,
+            duplicate_window_days,
+            watermark,
+            disk_cache,
+            registry,
+        )
+
+        if matcher_conflicts not in MATCHER_CONFLICT_MODES:
+            raise ValueError(
+                f"matcher_conflicts must be one of {', '.join(MATCHER_CONFLICT_MODES)}"
+            )
+
+        if len(set(matcher_priority)) != len(matcher_priority) or not set(
+            matcher_priority
+        ).issubset(DEFAULT_MATCHER_PRIORITY):
+            raise ValueError(
+                "matcher_priority must list some of "
+                f"{', '.join(DEFAULT_MATCHER_PRIORITY)}, each at most once"
+            )
+
         self.iban = iban
-        self.account_name = account_name
-        self.currency = currency
         self.meta_code = meta_code
-        self.iban_matcher = IBANMatcher(iban_matcher)
-        self.payee_matcher = AccountMatcher(payee_patterns)
-        self.description_matcher = AccountMatcher(description_patterns)
+        self.iban_matcher = IBANMatcher(iban_matcher, matcher_cache_size)
+        self.payee_matcher = AccountMatcher(payee_patterns, matcher_cache_size)
+        self.description_matcher = AccountMatcher(
+            description_patterns, matcher_cache_size
+        )
+
+        from .extractors.ec import V1Extractor, V2Extractor
 
         self._v1_extractor = V1Extractor(
             iban,
             meta_code,
             normalize_payee_address_spacing,
+            identify_prefix_size,
         )
         self._v2_extractor = V2Extractor(
             iban,
             meta_code,
             normalize_payee_address_spacing,
+            identify_prefix_size,
         )
 
-        self._date_from = None
-        self._date_to = None
-        self._balance_amount = None
-        self._balance_date = None
-        self._closing_balance_index = -1
-
-        if file_encoding is not None:
-            warnings.warn(
-                dedent(
-                    """
-                    The file_encoding parameter is no longer being used and will be
-                    removed in a future version.
-                    """
-                ),
-                DeprecationWarning,
-            )
-
-    @property
-    def name(self):
-        return "DKB {}".format(self.__class__.__name__)
-
-    def account(self, filepath: str) -> data.Account:
-        return self.account_name
-
-    def date(self, filepath: str):
-        self.extract(filepath, existing=None)
+        # rows matched by more than one matcher are either not even looked for
+        # (matching stops at the first hit), warned about, or collected in
+        # conflicts
+        self.matcher_conflicts = matcher_conflicts
+        self.matcher_priority = tuple(matcher_priority)
+        self.conflicts = ConflictReport()
+
+        if registry is not None:
+            registry.register(self)
+
+    def _config(self) -> tuple:
+        """
+        Everything about this importer that affects extracted entries
+        """
+
+        return (
+            type(self).__name__,
+            self.iban,
+            self.account_name,
+            self.currency,
+            self.meta_code,
+            self._v1_extractor.normalize_payee_address_spacing,
+            self.iban_matcher.config(),
+            self.payee_matcher.config(),
+            self.description_matcher.config(),
+            self.matcher_priority,
+        )
 
-        return self._date_to
+    def _iter_extract(
+        self, context: ExtractionContext, file_stats: Optional["FileStats"] = None
+    ):
+        filepath = context.filepath
+        extractor = context.extractor
 
-    def identify(self, filepath: str):
-        self._v1_extractor.set_filepath(filepath)
-        self._v2_extractor.set_filepath(filepath)
+        # Metadata
 
-        return self._v1_extractor.identify() or self._v2_extractor.identify()
+        if file_stats is not None:
+            file_stats.resume()
 
-    def extract(self, filepath: str, existing: Optional[data.Entries] = None):
-        self._v1_extractor.set_filepath(filepath)
-        self._v2_extractor.set_filepath(filepath)
+        line_index = self._extract_metadata(context)
 
-        extractor = None
+        if file_stats is not None:
+            file_stats.lap("metadata")
 
-        if self._v1_extractor.identify():
-            extractor = self._v1_extractor
-        elif self._v2_extractor.identify():
-            extractor = self._v2_extractor
-        else:
-            raise InvalidFormatError()
+        # Transactions
 
-        return self._extract(filepath, extractor)
+        lines = extractor.iter_transaction_lines(context.export)
+        rows = extractor.iter_transaction_rows(
+            context.export,
+            lines if file_stats is None else file_stats.timed(lines, "read"),
+        )
 
-    def _extract(self, filepath, extractor):
-        entries = []
+        if file_stats is not None:
+            rows = file_stats.timed(rows, "csv")
 
-        line_index = 0
+        row_filter = None
 
-        metadata_lines = extractor.extract_metadata_lines()
-        transaction_lines = extractor.extract_transaction_lines()
+        if self.watermark is not None:
+            from .registry import iban_key
 
-        # Metadata
+            row_filter = self.watermark.row_filter(iban_key(self.iban))
 
-        metadata = {}
-        reader = extractor.csv_reader(metadata_lines)
+        matchers = self._get_matchers()
+        stop_at_first_match = self.matcher_conflicts == "ignore"
 
-        for line in reader:
+        for line in rows:
             line_index += 1
 
-            if not line or line == [""]:
-                continue
-
-            key, value, *_ = line
-
-            metadata[key] = Meta(value, line_index)
-
-        self._update_meta(metadata)
-
-        # Transactions
+            date = extractor.get_booking_date(line)
 
-        reader = extractor.csv_dict_reader(transaction_lines)
+            if row_filter is not None and row_filter.skip(line, date):
+                if file_stats is not None:
+                    file_stats.rows += 1
+                    file_stats.rows_skipped += 1
 
-        for line in reader:
-            line_index += 1
+                continue
 
             meta = data.new_metadata(filepath, line_index)
 
-            amount = None
-            if extractor.get_amount(line):
-                amount = Amount(
-                    fmt_number_de(extractor.get_amount(line)), self.currency
-                )
+            amount = extractor.get_amount(line)
+            if amount:
+                amount = Amount(fmt_number_de(amount), self.currency)
+            else:
+                amount = None
 
-            date = extractor.get_booking_date(line)
+            if file_stats is not None:
+                file_stats.rows += 1
+                file_stats.lap("parse")
 
             if extractor.get_purpose(line) == "Tagessaldo":
                 if amount:
-                    entries.append(
-                        data.Balance(
-                            meta,
-                            date + timedelta(days=1),
-                            self.account(filepath),
-                            amount,
-                            None,
-                            None,
-                        )
+                    balance = data.Balance(
+                        meta,
+                        date + timedelta(days=1),
+                        self.account(filepath),
+                        amount,
+                        None,
+                        None,
                     )
+
+                    if file_stats is not None:
+                        file_stats.lap("directives")
+
+                    yield balance
             else:
                 if self.meta_code:
                     meta[self.meta_code] = extractor.get_booking_text(line)
@@ -163,91 +231,135 @@ class ECImporter(Importer):
                     new_posting(account=self.account(filepath), units=amount),
                 ]
 
-                matcher_accounts = [
-                    (
-                        "iban_matcher",
-                        "iban_matcher",
-                        self.iban_matcher.account_for(counterparty_iban),
-                    ),
-                    (
-                        "payee_patterns",
-                        "payee_pattern",
-                        self.payee_matcher.account_for(payee),
-                    ),
-                    (
-                        "description_patterns",
-                        "description_pattern",
-                        self.description_matcher.account_for(description),
-                    ),
-                ]
-                matcher_accounts = [
-                    matcher_account
-                    for matcher_account in matcher_accounts
-                    if matcher_account[2] is not None
-                ]
+                values = (counterparty_iban, payee, description)
+                matcher_accounts = []
 
-                if len(matcher_accounts) > 1:
-                    matcher_names = [
-                        matcher_account[0] for matcher_account in matcher_accounts
-                    ]
-                    selected_matcher = matcher_accounts[0][1]
-
-                    if len(matcher_names) == 2:
-                        matcher_names_text = (
-                            f"both {matcher_names[0]} and {matcher_names[1]}"
-                        )
-                    else:
-                        matcher_names_text = (
-                            f"{', '.join(matcher_names[:-1])} "
-                            f"and {matcher_names[-1]}"
-                        )
+                for matcher_name, matcher, value_index in matchers:
+                    value = values[value_index]
+                    account = matcher.account_for(value)
+
+                    if account is not None:
+                        matcher_accounts.append((matcher_name, matcher, value, account))
+
+                        if stop_at_first_match:
+                            break
+
+                if file_stats is not None:
+                    for matcher_name, matcher, value, _ in matcher_accounts:
+                        file_stats.count_match(matcher_name, matcher.rule_label(value))
+
+                    file_stats.lap("matchers")
 
-                    warnings.warn(
-                        f"Line {line_index + 1} matches {matcher_names_text}. "
-                        f"Picking {selected_matcher}.",
+                if len(matcher_accounts) > 1:
+                    self._handle_matcher_conflict(
+                        filepath, line_index, matcher_accounts
                     )
 
                 if matcher_accounts:
                     postings.append(
                         new_posting(
-                            account=matcher_accounts[0][2],
+                            account=matcher_accounts[0][3],
                             units=None,
                         )
                     )
 
-                entries.append(
-                    data.Transaction(
-                        meta,
-                        date,
-                        flags.FLAG_OKAY,
-                        payee,
-                        description,
-                        data.EMPTY_SET,
-                        data.EMPTY_SET,
-                        postings,
-                    )
+                transaction = data.Transaction(
+                    meta,
+                    date,
+                    flags.FLAG_OKAY,
+                    payee,
+                    description,
+                    data.EMPTY_SET,
+                    data.EMPTY_SET,
+                    postings,
                 )
 
+                if file_stats is not None:
+                    file_stats.lap("directives")
+
+                yield transaction
+
+        if row_filter is not None:
+            self.watermark.update(iban_key(self.iban), row_filter)
+
         # Closing Balance
-        entries.append(
-            data.Balance(
-                data.new_metadata(filepath, self._closing_balance_index),
-                self._balance_date,
-                self.account(filepath),
-                self._balance_amount,
-                None,
-                None,
+        metadata = context.metadata
+
+        yield data.Balance(
+            data.new_metadata(filepath, metadata.closing_balance_index),
+            metadata.balance_date,
+            self.account(filepath),
+            metadata.balance_amount,
+            None,
+            None,
+        )
+
+    def _get_matchers(self) -> list:
+        """
+        Return (name, matcher, value index) of the matchers with rules, in the
+        order of matcher_priority
+
+        The value index points into the (counterparty IBAN, payee, description)
+        tuple built for every row.
+        """
+
+        matchers = {
+            "iban_matcher": (self.iban_matcher, self.iban_matcher.entries, 0),
+            "payee_patterns": (self.payee_matcher, self.payee_matcher.patterns, 1),
+            "description_patterns": (
+                self.description_matcher,
+                self.description_matcher.patterns,
+                2,
+            ),
+        }
+
+        return [
+            (matcher_name, matchers[matcher_name][0], matchers[matcher_name][2])
+            for matcher_name in self.matcher_priority
+            if matchers[matcher_name][1]
+        ]
+
+    def _handle_matcher_conflict(
+        self, filepath: str, line_index: int, matcher_accounts: list
+    ) -> None:
+        if self.matcher_conflicts == "report":
+            self.conflicts.add(
+                filepath,
+                line_index + 1,
+                [
+                    MatcherRule(matcher_name, matcher.rule_label(value))
+                    for matcher_name, matcher, value, _ in matcher_accounts
+                ],
+            )
+            return
+
+        matcher_names = [matcher_account[0] for matcher_account in matcher_accounts]
+        selected_matcher = _SELECTED_MATCHER_NAMES[matcher_names[0]]
+
+        if len(matcher_names) == 2:
+            matcher_names_text = f"both {matcher_names[0]} and {matcher_names[1]}"
+        else:
+            matcher_names_text = (
+                f"{', '.join(matcher_names[:-1])} and {matcher_names[-1]}"
             )
+
+        warnings.warn(
+            f"Line {line_index + 1} matches {matcher_names_text}. "
+            f"Picking {selected_matcher}.",
         )
 
-        return entries
+    def _parse_meta(self, meta: Dict[str, Meta]) -> FileMetadata:
+        metadata = FileMetadata()
 
-    def _update_meta(self, meta: Dict[str, str]):
         for key, value in meta.items():
             if key.startswith("Von"):
-                self._date_from = datetime.strptime(value.value, "%d.%m.%Y").date()
+                metadata = metadata._replace(
+                    date_from=parse_date(value.value, "%d.%m.%Y")
+                )
             elif key.startswith("Bis"):
-                self._date_to = datetime.strptime(value.value, "%d.%m.%Y").date()
+                metadata = metadata._replace(
+                    date_to=parse_date(value.value, "%d.%m.%Y")
+                )
             elif key.startswith("Kontostand vom"):
                 # Beancount expects the balance amount to be from the
                 # beginning of the day, while the Tagessaldo entries in
@@ -256,10 +368,15 @@ class ECImporter(Importer):
                 # of 1 day to the original value to make the balance
                 # assertions work.
 
-                self._balance_amount = Amount(
-                    fmt_number_de(value.value.split()[0]), self.currency
+                metadata = metadata._replace(
+                    balance_amount=Amount(
+                        fmt_number_de(value.value.split()[0]), self.currency
+                    ),
+                    balance_date=parse_date(
+                        key.lstrip("Kontostand vom ").rstrip(":"), "%d.%m.%Y"
+                    )
+                    + timedelta(days=1),
+                    closing_balance_index=value.line_index,
                 )
-                self._balance_date = datetime.strptime(
-                    key.lstrip("Kontostand vom ").rstrip(":"), "%d.%m.%Y"
-                ).date() + timedelta(days=1)
-                self._closing_balance_index = value.line_index
+
+        return metadata
@@ -1,71 +1,32 @@
 import csv
 from functools import partial
+from operator import itemgetter
 from collections import namedtuple
-from datetime import date, datetime
-from typing import Dict, Optional
+from datetime import date
+from typing import Sequence
 
-from ..helpers import Header
+from ..helpers import Header, parse_date
+from .export import DEFAULT_PREFIX_SIZE, ExportExtractor, ParsedExport
 
 Meta = namedtuple("Meta", ["value", "line_index"])
 
 
-class BaseExtractor:
-    def __init__(self, card_number: str):
-        self.card_number = card_number
-
-        self.filepath = None
-        self._csv_delimiter = None
-
-    def set_filepath(self, filepath: str):
-        self.filepath = filepath
-
-    @property
-    def csv_reader(self):
-        raise NotImplementedError()
+class BaseExtractor(ExportExtractor):
+    def __init__(self, card_number: str, prefix_size: int = DEFAULT_PREFIX_SIZE):
+        super().__init__(prefix_size)
 
-    @property
-    def csv_dict_reader(self):
-        raise NotImplementedError()
-
-    def get_account_number(self, line: Dict[str, str]) -> str:
-        raise NotImplementedError()
+        self.card_number = card_number
 
-    def identify(self) -> bool:
+    def get_account_number(self, line: Sequence[str]) -> str:
         raise NotImplementedError()
 
-    def extract_metadata_lines(self) -> list[str]:
-        with open(self.filepath, encoding=self.file_encoding) as fd:
-            lines = [line.strip() for line in fd.readlines()]
-
-        for header in self._get_possible_headers():
-            if header.value not in lines:
-                continue
-
-            header_index = lines.index(header.value)
-            metadata_lines = lines[0:header_index]
-
-            return metadata_lines
-
-    def extract_transaction_lines(self) -> list[str]:
-        with open(self.filepath, encoding=self.file_encoding) as fd:
-            lines = [line.strip() for line in fd.readlines()]
-
-        for header in self._get_possible_headers():
-            if header.value not in lines:
-                continue
-
-            header_index = lines.index(header.value)
-            transaction_lines = lines[header_index:]
-
-            return transaction_lines
-
-    def get_amount(self, line: Dict[str, str]) -> str:
+    def get_amount(self, line: Sequence[str]) -> str:
         raise NotImplementedError()
 
-    def get_valuation_date(self, line: Dict[str, str]) -> date:
+    def get_valuation_date(self, line: Sequence[str]) -> date:
         raise NotImplementedError()
 
-    def get_description(self, line: Dict[str, str]) -> str:
+    def get_description(self, line: Sequence[str]) -> str:
         raise NotImplementedError()
 
 
@@ -83,43 +44,39 @@ class V1Extractor(BaseExtractor):
 
     file_encoding = "ISO-8859-1"
 
-    @property
-    def csv_reader(self):
-        return partial(
-            csv.reader, delimiter=";", quoting=csv.QUOTE_MINIMAL, quotechar='"'
-        )
+    _amount = itemgetter(FIELDS.index("Betrag (EUR)"))
+    _valuation_date = itemgetter(FIELDS.index("Wertstellung"))
+    _description = itemgetter(FIELDS.index("Beschreibung"))
 
-    @property
-    def csv_dict_reader(self):
+    def csv_reader(self, export: ParsedExport):
         return partial(
-            csv.DictReader, delimiter=";", quoting=csv.QUOTE_MINIMAL, quotechar='"'
+            csv.reader, delimiter=";", quoting=csv.QUOTE_MINIMAL, quotechar='"'
         )
 
-    def identify(self) -> bool:
+    def identify(self, prefix: ParsedExport) -> bool:
         expected_header_prefixes = (
             f'"Kreditkarte:";"{self.card_number} Kreditkarte";',
             f'"Kreditkarte:";"{self.card_number}";',
             f'"Kreditkarte:";"{self.card_number[:4]}********{self.card_number[-4:]}";',
         )
 
-        with open(self.filepath, encoding=self.file_encoding) as fd:
-            line = fd.readline().strip()
+        line = prefix.first_line
 
-            return any(line.startswith(header) for header in expected_header_prefixes)
+        return any(line.startswith(header) for header in expected_header_prefixes)
 
     def _get_possible_headers(self) -> list[Header]:
         return [
             Header(";".join(f'"{field}"' for field in self.FIELDS) + ";", ";"),
         ]
 
-    def get_amount(self, line: Dict[str, str]) -> str:
-        return line["Betrag (EUR)"]
+    def get_amount(self, line: Sequence[str]) -> str:
+        return self._amount(line)
 
-    def get_valuation_date(self, line: Dict[str, str]) -> date:
-        return datetime.strptime(line["Wertstellung"], "%d.%m.%Y").date()
+    def get_valuation_date(self, line: Sequence[str]) -> date:
+        return parse_date(self._valuation_date(line), "%d.%m.%Y")
 
-    def get_description(self, line: Dict[str, str]) -> str:
-        return line["Beschreibung"]
+    def get_description(self, line: Sequence[str]) -> str:
+        return self._description(line)
 
 
 class V2Extractor(BaseExtractor):
@@ -137,72 +94,37 @@ class V2Extractor(BaseExtractor):
 
     file_encoding = "utf-8-sig"
 
-    @property
-    def csv_delimiter(self):
-        if self._csv_delimiter is None:
-            header = self._get_applicable_header()
+    _amount = itemgetter(FIELDS.index("Betrag (€)"))
+    _valuation_date = itemgetter(FIELDS.index("Wertstellung"))
+    _description = itemgetter(FIELDS.index("Beschreibung"))
 
-            if header is not None:
-                self._csv_delimiter = header.delimiter
-
-        return self._csv_delimiter
-
-    @property
-    def csv_reader(self):
-        assert self.csv_delimiter is not None
+    def csv_reader(self, export: ParsedExport):
+        assert export.delimiter is not None
 
         return partial(
             csv.reader,
-            delimiter=self.csv_delimiter,
+            delimiter=export.delimiter,
             quoting=csv.QUOTE_MINIMAL,
             quotechar='"',
         )
 
-    @property
-    def csv_dict_reader(self):
-        assert self.csv_delimiter is not None
+    def identify(self, prefix: ParsedExport) -> bool:
+        header = prefix.header
 
-        return partial(
-            csv.DictReader,
-            delimiter=self.csv_delimiter,
-            quoting=csv.QUOTE_MINIMAL,
-            quotechar='"',
-        )
+        if header is None:
+            return False
 
-    def _get_applicable_header(self) -> Optional[Header]:
-        with open(self.filepath, encoding=self.file_encoding) as fd:
-            lines = [line.strip() for line in fd.readlines()]
-
-        return next(
-            (
-                header
-                for header in self._get_possible_headers()
-                if header.value in lines
-            ),
-            None,
+        expected_prefix = (
+            f'"Karte"{header.delimiter}"'
+            f'Visa Kreditkarte"{header.delimiter}"'
+            f"{self.card_number[:4]}"
         )
 
-    def identify(self) -> bool:
-        try:
-            header = self._get_applicable_header()
-
-            if header is None:
-                return False
+        line = prefix.first_line
 
-            expected_prefix = (
-                f'"Karte"{header.delimiter}"'
-                f'Visa Kreditkarte"{header.delimiter}"'
-                f"{self.card_number[:4]}"
-            )
-
-            with open(self.filepath, encoding=self.file_encoding) as fd:
-                line = fd.readline().strip()
-
-                return line.startswith(expected_prefix) and line.endswith(
-                    f'{self.card_number[-4:]}"'
-                )
-        except UnicodeDecodeError:
-            return False
+        return line.startswith(expected_prefix) and line.endswith(
+            f'{self.card_number[-4:]}"'
+        )
 
     def _get_possible_headers(self) -> list[Header]:
         return [
@@ -210,11 +132,11 @@ class V2Extractor(BaseExtractor):
             Header(";".join(f'"{field}"' for field in self.FIELDS), ";"),
         ]
 
-    def get_amount(self, line: Dict[str, str]) -> str:
-        return line["Betrag (€)"].rstrip(" €")
+    def get_amount(self, line: Sequence[str]) -> str:
+        return self._amount(line).rstrip(" €")
 
-    def get_valuation_date(self, line: Dict[str, str]) -> date:
-        return datetime.strptime(line["Wertstellung"], "%d.%m.%y").date()
+    def get_valuation_date(self, line: Sequence[str]) -> date:
+        return parse_date(self._valuation_date(line), "%d.%m.%y")
 
-    def get_description(self, line: Dict[str, str]) -> str:
-        return line["Beschreibung"]
+    def get_description(self, line: Sequence[str]) -> str:
+        return self._description(line)
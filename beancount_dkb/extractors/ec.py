@@ -1,98 +1,54 @@
 from collections import namedtuple
 import csv
 from functools import partial
+from operator import itemgetter
 import re
-from datetime import date, datetime
-from typing import Dict, Optional
+from datetime import date
+from typing import Optional, Sequence
 
 from ..exceptions import InvalidFormatError
-from ..helpers import Header
+from ..helpers import Header, parse_date
+from .export import DEFAULT_PREFIX_SIZE, ExportExtractor, ParsedExport
 
 Meta = namedtuple("Meta", ["value", "line_index"])
 
 
-class BaseExtractor:
+class BaseExtractor(ExportExtractor):
     def __init__(
         self,
         iban: str,
         meta_code: Optional[str] = None,
         normalize_payee_address_spacing: bool = False,
+        prefix_size: int = DEFAULT_PREFIX_SIZE,
     ):
+        super().__init__(prefix_size)
+
         self.iban = iban
         self.meta_code = meta_code
         self.normalize_payee_address_spacing = normalize_payee_address_spacing
 
-        self.filepath = None
-        self._csv_delimiter = None
-
-    def set_filepath(self, filepath: str):
-        self.filepath = filepath
-
-    @property
-    def csv_reader(self):
-        raise NotImplementedError()
-
-    def csv_dict_reader(self):
-        raise NotImplementedError()
-
-    def identify(self) -> bool:
-        raise NotImplementedError()
-
-    def extract_metadata_lines(self) -> list[str]:
-        with open(self.filepath, encoding=self.file_encoding) as fd:
-            lines = [line.strip() for line in fd.readlines()]
-
-        for header in self._get_possible_headers():
-            if header.value not in lines:
-                continue
-
-            header_index = lines.index(header.value)
-            metadata_lines = lines[0:header_index]
-
-            return metadata_lines
-
-    def extract_transaction_lines(self) -> list[str]:
-        with open(self.filepath, encoding=self.file_encoding) as fd:
-            lines = [line.strip() for line in fd.readlines()]
-
-        for header in self._get_possible_headers():
-            if header.value not in lines:
-                continue
-
-            header_index = lines.index(header.value)
-            transaction_lines = lines[header_index:]
-
-            return transaction_lines
-
-    def _get_possible_headers(self) -> list[Header]:
-        """
-        Return a list of possible header lines that the file could start with
-        """
-
-        raise NotImplementedError()
-
-    def get_account_number(self, line: Dict[str, str]) -> str:
+    def get_account_number(self, line: Sequence[str]) -> str:
         raise NotImplementedError()
 
-    def get_amount(self, line: Dict[str, str]) -> str:
+    def get_amount(self, line: Sequence[str]) -> str:
         raise NotImplementedError()
 
-    def get_booking_date(self, line: Dict[str, str]) -> date:
+    def get_booking_date(self, line: Sequence[str]) -> date:
         raise NotImplementedError()
 
-    def get_booking_text(self, line: Dict[str, str]) -> str:
+    def get_booking_text(self, line: Sequence[str]) -> str:
         raise NotImplementedError()
 
-    def get_counterparty_iban(self, line: Dict[str, str]) -> Optional[str]:
+    def get_counterparty_iban(self, line: Sequence[str]) -> Optional[str]:
         raise NotImplementedError()
 
-    def get_description(self, line: Dict[str, str]) -> str:
+    def get_description(self, line: Sequence[str]) -> str:
         raise NotImplementedError()
 
-    def get_payee(self, line: Dict[str, str]) -> str:
+    def get_payee(self, line: Sequence[str]) -> str:
         raise NotImplementedError()
 
-    def get_purpose(self, line: Dict[str, str]) -> str:
+    def get_purpose(self, line: Sequence[str]) -> str:
         raise NotImplementedError()
 
 
@@ -122,19 +78,19 @@ class V1Extractor(BaseExtractor):
 
     file_encoding = "ISO-8859-1"
 
-    @property
-    def csv_reader(self):
-        return partial(
-            csv.reader, delimiter=";", quoting=csv.QUOTE_MINIMAL, quotechar='"'
-        )
+    _account_number = itemgetter(FIELDS.index("Kontonummer"))
+    _amount = itemgetter(FIELDS.index("Betrag (EUR)"))
+    _booking_date = itemgetter(FIELDS.index("Buchungstag"))
+    _booking_text = itemgetter(FIELDS.index("Buchungstext"))
+    _payee = itemgetter(FIELDS.index("Auftraggeber / Begünstigter"))
+    _purpose = itemgetter(FIELDS.index("Verwendungszweck"))
 
-    @property
-    def csv_dict_reader(self):
+    def csv_reader(self, export: ParsedExport):
         return partial(
-            csv.DictReader, delimiter=";", quoting=csv.QUOTE_MINIMAL, quotechar='"'
+            csv.reader, delimiter=";", quoting=csv.QUOTE_MINIMAL, quotechar='"'
         )
 
-    def identify(self) -> bool:
+    def identify(self, prefix: ParsedExport) -> bool:
         regex = re.compile(
             r'^"Kontonummer:";"'
             + re.escape(re.sub(r"\s+", "", self.iban, flags=re.UNICODE))
@@ -142,45 +98,44 @@ class V1Extractor(BaseExtractor):
             re.IGNORECASE,
         )
 
-        with open(self.filepath, encoding=self.file_encoding) as fd:
-            line = fd.readline().strip()
+        line = prefix.first_line
 
-            return regex.match(line)
+        return regex.match(line)
 
     def _get_possible_headers(self) -> list[Header]:
         return [
             Header(";".join(f'"{field}"' for field in self.FIELDS) + ";", ";"),
         ]
 
-    def get_account_number(self, line: Dict[str, str]) -> str:
-        return line["Kontonummer"]
+    def get_account_number(self, line: Sequence[str]) -> str:
+        return self._account_number(line)
 
-    def get_amount(self, line: Dict[str, str]) -> str:
-        return line["Betrag (EUR)"]
+    def get_amount(self, line: Sequence[str]) -> str:
+        return self._amount(line)
 
-    def get_booking_date(self, line: Dict[str, str]) -> date:
-        return datetime.strptime(line["Buchungstag"], "%d.%m.%Y").date()
+    def get_booking_date(self, line: Sequence[str]) -> date:
+        return parse_date(self._booking_date(line), "%d.%m.%Y")
 
-    def get_booking_text(self, line: Dict[str, str]) -> str:
-        return line["Buchungstext"]
+    def get_booking_text(self, line: Sequence[str]) -> str:
+        return self._booking_text(line)
 
-    def get_counterparty_iban(self, line: Dict[str, str]) -> Optional[str]:
+    def get_counterparty_iban(self, line: Sequence[str]) -> Optional[str]:
         return None
 
-    def get_description(self, line: Dict[str, str]) -> str:
+    def get_description(self, line: Sequence[str]) -> str:
         purpose = self.get_purpose(line) or self.get_account_number(line)
         booking_text = self.get_booking_text(line)
 
         return f"{booking_text} {purpose}" if not self.meta_code else purpose
 
-    def get_payee(self, line: Dict[str, str]) -> str:
+    def get_payee(self, line: Sequence[str]) -> str:
         return _normalize_payee(
-            line["Auftraggeber / Begünstigter"],
+            self._payee(line),
             self.normalize_payee_address_spacing,
         )
 
-    def get_purpose(self, line: Dict[str, str]) -> str:
-        return line["Verwendungszweck"]
+    def get_purpose(self, line: Sequence[str]) -> str:
+        return self._purpose(line)
 
 
 class V2Extractor(BaseExtractor):
@@ -203,34 +158,21 @@ class V2Extractor(BaseExtractor):
 
     file_encoding = "utf-8-sig"
 
-    @property
-    def csv_delimiter(self):
-        if self._csv_delimiter is None:
-            header = self._get_applicable_header()
-
-            if header is not None:
-                self._csv_delimiter = header.delimiter
+    _account_number = itemgetter(FIELDS.index("Gläubiger-ID"))
+    _amount = itemgetter(FIELDS.index("Betrag (€)"))
+    _booking_date = itemgetter(FIELDS.index("Buchungsdatum"))
+    _booking_text = itemgetter(FIELDS.index("Umsatztyp"))
+    _counterparty_iban = itemgetter(FIELDS.index("IBAN"))
+    _payer = itemgetter(FIELDS.index("Zahlungspflichtige*r"))
+    _receiver = itemgetter(FIELDS.index("Zahlungsempfänger*in"))
+    _purpose = itemgetter(FIELDS.index("Verwendungszweck"))
 
-        return self._csv_delimiter
-
-    @property
-    def csv_reader(self):
-        assert self.csv_delimiter is not None
+    def csv_reader(self, export: ParsedExport):
+        assert export.delimiter is not None
 
         return partial(
             csv.reader,
-            delimiter=self.csv_delimiter,
-            quoting=csv.QUOTE_MINIMAL,
-            quotechar='"',
-        )
-
-    @property
-    def csv_dict_reader(self):
-        assert self.csv_delimiter is not None
-
-        return partial(
-            csv.DictReader,
-            delimiter=self.csv_delimiter,
+            delimiter=export.delimiter,
             quoting=csv.QUOTE_MINIMAL,
             quotechar='"',
         )
@@ -241,71 +183,57 @@ class V2Extractor(BaseExtractor):
             Header(";".join(f'"{field}"' for field in self.FIELDS), ";"),
         ]
 
-    def _get_applicable_header(self) -> Optional[Header]:
-        with open(self.filepath, encoding=self.file_encoding) as fd:
-            lines = [line.strip() for line in fd.readlines()]
-
-        return next(
-            (
-                header
-                for header in self._get_possible_headers()
-                if header.value in lines
-            ),
-            None,
-        )
+    def identify(self, prefix: ParsedExport) -> bool:
+        header = prefix.header
 
-    def identify(self) -> bool:
-        try:
-            if self._get_applicable_header() is None:
-                return False
+        if header is None:
+            return False
 
-            metadata_lines = self.extract_metadata_lines()
+        metadata_lines = prefix.metadata_lines
 
-            regex = re.compile(
-                r'^"(Girokonto(?: u18)?|Tagesgeld|DKB Festgeld)"'
-                + self.csv_delimiter
-                + '"'
-                + re.escape(re.sub(r"\s+", "", self.iban, flags=re.UNICODE))
-                + r'"',
-                re.IGNORECASE,
-            )
+        regex = re.compile(
+            r'^"(Girokonto(?: u18)?|Tagesgeld|DKB Festgeld)"'
+            + header.delimiter
+            + '"'
+            + re.escape(re.sub(r"\s+", "", self.iban, flags=re.UNICODE))
+            + r'"',
+            re.IGNORECASE,
+        )
 
-            for line in metadata_lines:
-                if regex.match(line):
-                    return True
+        for line in metadata_lines:
+            if regex.match(line):
+                return True
 
-            return False
-        except UnicodeDecodeError:
-            return False
+        return False
 
-    def get_account_number(self, line: Dict[str, str]) -> str:
-        return line["Gläubiger-ID"]
+    def get_account_number(self, line: Sequence[str]) -> str:
+        return self._account_number(line)
 
-    def get_amount(self, line: Dict[str, str]) -> str:
-        return line["Betrag (€)"].rstrip(" €")
+    def get_amount(self, line: Sequence[str]) -> str:
+        return self._amount(line).rstrip(" €")
 
-    def get_booking_date(self, line: Dict[str, str]) -> date:
-        return datetime.strptime(line["Buchungsdatum"], "%d.%m.%y").date()
+    def get_booking_date(self, line: Sequence[str]) -> date:
+        return parse_date(self._booking_date(line), "%d.%m.%y")
 
-    def get_booking_text(self, line: Dict[str, str]) -> str:
-        return line["Umsatztyp"]
+    def get_booking_text(self, line: Sequence[str]) -> str:
+        return self._booking_text(line)
 
-    def get_counterparty_iban(self, line: Dict[str, str]) -> Optional[str]:
-        return line["IBAN"]
+    def get_counterparty_iban(self, line: Sequence[str]) -> Optional[str]:
+        return self._counterparty_iban(line)
 
-    def get_description(self, line: Dict[str, str]) -> str:
+    def get_description(self, line: Sequence[str]) -> str:
         return self.get_purpose(line)
 
-    def get_payee(self, line: Dict[str, str]) -> str:
-        type_ = line["Umsatztyp"]
+    def get_payee(self, line: Sequence[str]) -> str:
+        type_ = self._booking_text(line)
 
         # if money is going out then payee should be the receiver
         # otherwise if money is coming in then payee should be the sender
 
         if type_ == "Ausgang":
-            payee = line["Zahlungsempfänger*in"]
+            payee = self._receiver(line)
         elif type_ == "Eingang":
-            payee = line["Zahlungspflichtige*r"]
+            payee = self._payer(line)
         else:
             raise InvalidFormatError(f"Unknown Umsatztyp: {type_}")
 
@@ -314,5 +242,5 @@ class V2Extractor(BaseExtractor):
             self.normalize_payee_address_spacing,
         )
 
-    def get_purpose(self, line: Dict[str, str]) -> str:
-        return line["Verwendungszweck"]
+    def get_purpose(self, line: Sequence[str]) -> str:
+        return self._purpose(line)
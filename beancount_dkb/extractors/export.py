@@ -0,0 +1,256 @@
+import codecs
+import io
+from typing import Iterable, Iterator, Optional, Sequence
+
+from ..helpers import Header
+
+# The metadata block and the header of DKB exports fit comfortably in this many
+# bytes, so identifying a file never needs to read more than that
+DEFAULT_PREFIX_SIZE = 8 * 1024
+
+
+def read_prefix_lines(filepath: str, encoding: str, size: int) -> list[str]:
+    """
+    Decode at most size bytes from the start of a file and return the complete,
+    stripped lines contained in them
+    """
+
+    with open(filepath, "rb") as fd:
+        raw = fd.read(size + 1)
+
+    truncated = len(raw) > size
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    text = decoder.decode(raw[:size], final=not truncated)
+
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+    # the last element is either cut off by the size limit, or empty because the
+    # file ends with a newline
+    if truncated or lines[-1] == "":
+        lines.pop()
+
+    return [line.strip() for line in lines]
+
+
+def iter_csv_rows(reader: Iterator[list[str]], width: int) -> Iterator[list[str]]:
+    """
+    Yield the rows of a CSV reader positioned on a header, padded to width values
+
+    This mirrors what csv.DictReader did before: the header row and empty rows are
+    skipped, and missing trailing values are None.
+    """
+
+    next(reader, None)
+
+    for row in reader:
+        if not row:
+            continue
+
+        if len(row) < width:
+            row.extend([None] * (width - len(row)))
+
+        yield row
+
+
+class ParsedExport:
+    """
+    A DKB CSV export which is read and decoded at most once
+
+    Opening an export only reads the file up to (and including) the header row,
+    which is enough to know the metadata lines and the CSV delimiter. The header is
+    located as a byte offset, and the transaction lines below it are decoded and
+    streamed from that offset when they're asked for, without keeping them in
+    memory.
+
+    Lines are split on b"\n" before decoding, which holds for the encodings used by
+    DKB (ISO-8859-1 and UTF-8).
+
+    With max_bytes, only that many bytes from the start of the file are considered,
+    which is used to identify files without reading more than necessary.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        encoding: str,
+        possible_headers: Sequence[Header],
+        max_bytes: Optional[int] = None,
+    ):
+        self.filepath = filepath
+        self.encoding = encoding
+
+        self.header: Optional[Header] = None
+        self.header_index: Optional[int] = None
+
+        # byte offsets of the header row and of the first transaction line
+        self.header_offset: Optional[int] = None
+        self.body_offset: Optional[int] = None
+
+        self._lines: list[str] = []
+
+        self._headers_by_value = {
+            header.value: header for header in possible_headers
+        }
+
+        if max_bytes is not None:
+            self._scan(read_prefix_lines(filepath, encoding, max_bytes))
+            return
+
+        with open(filepath, "rb") as fd:
+            self._scan(self._iter_raw_lines(fd))
+
+    def _iter_raw_lines(self, fd: io.BufferedReader) -> Iterator[str]:
+        """
+        Decode the lines of a binary file, keeping track of their byte offsets
+        """
+
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        offset = 0
+
+        for raw_line in fd:
+            line = decoder.decode(raw_line).strip()
+
+            if line in self._headers_by_value:
+                self.header_offset = offset
+                self.body_offset = offset + len(raw_line)
+
+            offset += len(raw_line)
+
+            yield line
+
+    def _scan(self, lines: Iterable[str]) -> None:
+        """
+        Collect the lines above the header, stopping right after the header
+        """
+
+        for line in lines:
+            header = self._headers_by_value.get(line)
+
+            if header is not None:
+                self.header = header
+                self.header_index = len(self._lines)
+                break
+
+            self._lines.append(line)
+
+    @property
+    def delimiter(self) -> Optional[str]:
+        return self.header.delimiter if self.header is not None else None
+
+    @property
+    def first_line(self) -> str:
+        if self._lines:
+            return self._lines[0]
+
+        return self.header.value if self.header is not None else ""
+
+    @property
+    def metadata_lines(self) -> Optional[list[str]]:
+        if self.header_index is None:
+            return None
+
+        return self._lines
+
+    def iter_transaction_lines(self) -> Iterator[str]:
+        """
+        Yield the header and the transaction lines below it, as they're read
+        """
+
+        if self.header_index is None:
+            return
+
+        if self.body_offset is None:
+            raise ValueError("Transaction lines are not available for a prefix")
+
+        yield self.header.value
+
+        with open(self.filepath, "rb") as raw:
+            raw.seek(self.body_offset)
+
+            with io.TextIOWrapper(raw, encoding=self.encoding) as fd:
+                for line in fd:
+                    yield line.strip()
+
+
+class ExportExtractor:
+    """
+    What the EC and credit card extractors have in common
+
+    Subclasses define FIELDS and file_encoding, and implement csv_reader(),
+    identify() and _get_possible_headers().
+    """
+
+    FIELDS: Sequence[str] = ()
+
+    file_encoding: str
+
+    def __init__(self, prefix_size: int = DEFAULT_PREFIX_SIZE):
+        self.prefix_size = prefix_size
+
+    def read_prefix(self, filepath: str) -> ParsedExport:
+        """
+        Read the first prefix_size bytes of a file, which is enough to identify it
+        """
+
+        return ParsedExport(
+            filepath,
+            self.file_encoding,
+            self._get_possible_headers(),
+            max_bytes=self.prefix_size,
+        )
+
+    def read_export(self, filepath: str) -> ParsedExport:
+        """
+        Open a file for extraction, reading it up to the header
+
+        Extractors don't keep any state about the files they read, everything is
+        passed around in the returned ParsedExport.
+        """
+
+        return ParsedExport(filepath, self.file_encoding, self._get_possible_headers())
+
+    def csv_reader(self, export: ParsedExport):
+        raise NotImplementedError()
+
+    def identify(self, prefix: ParsedExport) -> bool:
+        raise NotImplementedError()
+
+    def identify_file(self, filepath: str) -> bool:
+        """
+        Read the prefix of a file and check whether it's in this extractor's format
+        """
+
+        try:
+            prefix = self.read_prefix(filepath)
+        except UnicodeDecodeError:
+            return False
+
+        return self.identify(prefix)
+
+    def extract_metadata_lines(self, export: ParsedExport) -> list[str]:
+        return export.metadata_lines
+
+    def iter_transaction_lines(self, export: ParsedExport) -> Iterator[str]:
+        return export.iter_transaction_lines()
+
+    def iter_transaction_rows(
+        self, export: ParsedExport, lines: Optional[Iterable[str]] = None
+    ) -> Iterator[list[str]]:
+        """
+        Yield the transaction rows as lists of values, in the order of FIELDS
+
+        lines defaults to iter_transaction_lines(export).
+        """
+
+        if lines is None:
+            lines = self.iter_transaction_lines(export)
+
+        return iter_csv_rows(self.csv_reader(export)(lines), len(self.FIELDS))
+
+    def _get_possible_headers(self) -> list[Header]:
+        """
+        Return a list of possible header lines that the file could start with
+        """
+
+        raise NotImplementedError()
@@ -1,10 +1,13 @@
 import csv
+import os
 import re
+import threading
 import warnings
-from functools import partial
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import lru_cache, partial
 from typing import NamedTuple, Optional, Sequence
 
-from babel.numbers import parse_decimal, NumberFormatError
 from beancount.core.number import Decimal
 
 csv_reader = partial(
@@ -26,6 +29,13 @@ class _IBANMatcherEntry(NamedTuple):
     account: str
 
 
+class MatcherCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
 class Header(NamedTuple):
     value: str
     delimiter: str
@@ -36,17 +46,55 @@ class Meta(NamedTuple):
     line_index: int
 
 
+# Plain numbers as they appear in DKB exports, e.g. "1.234,56" or "-8,67" (de_DE),
+# and "5000.01" (en_US, legacy credit card balances). Anything else is handed to
+# babel, so the fast path only needs to cover what's common. babel is only imported
+# then, since it takes a while to load.
+_NUMBER_DE = re.compile(r"(-?\d[\d.]*)(?:,(\d+))?")
+_NUMBER_EN = re.compile(r"(-?\d[\d,]*)(?:\.(\d+))?")
+
+# Longer values could exceed the precision of the default decimal context, which
+# quantize() (on the babel path) would reject
+_MAX_FAST_NUMBER_LENGTH = 24
+
+
+def _fmt_number(value: str, pattern: re.Pattern, group_symbol: str, locale: str):
+    match = (
+        pattern.fullmatch(value) if len(value) <= _MAX_FAST_NUMBER_LENGTH else None
+    )
+
+    if match is None:
+        return _fmt_number_babel(value, locale)
+
+    integer, fraction = match.groups()
+
+    if fraction is not None and len(fraction) > 2:
+        # babel raises the appropriate NumberFormatError
+        return _fmt_number_babel(value, locale)
+
+    integer = integer.replace(group_symbol, "")
+    fraction = (fraction or "").ljust(2, "0")
+
+    return Decimal(f"{integer}.{fraction}")
+
+
+def _fmt_number_babel(value: str, locale: str) -> Decimal:
+    from babel.numbers import NumberFormatError, parse_decimal
+
+    num = parse_decimal(value, locale=locale)
+    if num.as_tuple().exponent < -2:
+        raise NumberFormatError(f'{value} contains unexpected number of decimal places')
+    else:
+        return num.quantize(Decimal('.01'))
+
+
 def fmt_number_de(value: str) -> Decimal:
     """
     Format a de_DE locale formatted number
     Use always 2 decimal digits
     """
 
-    num = parse_decimal(value, locale="de_DE")
-    if num.as_tuple().exponent < -2:
-        raise NumberFormatError(f'{value} contains unexpected number of decimal places')
-    else:
-        return num.quantize(Decimal('.01'))
+    return _fmt_number(value, _NUMBER_DE, ".", "de_DE")
 
 
 def fmt_number_en(value: str) -> Decimal:
@@ -55,17 +103,158 @@ def fmt_number_en(value: str) -> Decimal:
     Use always 2 decimal digits
     """
 
-    num = parse_decimal(value, locale="en_US")
-    if num.as_tuple().exponent < -2:
-        raise NumberFormatError(f'{value} contains unexpected number of decimal places')
-    else:
-        return num.quantize(Decimal('.01'))
+    return _fmt_number(value, _NUMBER_EN, ",", "en_US")
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str, format: str) -> date:
+    """
+    Parse a date using the given strptime format
+
+    Exports typically contain only a few hundred distinct dates spread over many
+    rows, so results are memoized instead of calling strptime for every row.
+    """
+
+    return datetime.strptime(value, format).date()
+
+
+
+def atomic_write(path: str, content: bytes) -> None:
+    """
+    Replace the file at path with content, so that readers (and the file after a
+    crash) only ever see either the old or the new content
+    """
+
+    # only needed by the opt-in disk cache and watermark store
+    import tempfile
+
+    fd, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+    )
+
+    try:
+        with os.fdopen(fd, "wb") as temporary_file:
+            temporary_file.write(content)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+class _MatcherCache:
+    """
+    Bounded LRU memo of matcher results, keyed on the string being matched
+
+    The cache can be shared between threads. Results are computed outside the
+    lock, so two threads may both compute a missing result, which is harmless.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._results: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key, compute):
+        with self._lock:
+            try:
+                result = self._results[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._results.move_to_end(key)
+
+                return result
+
+        result = compute(key)
+
+        with self._lock:
+            self._results[key] = result
+
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+    def __getstate__(self) -> dict:
+        # a copy (e.g. sent to a worker process) starts out empty
+        state = self.__dict__.copy()
+        state.update(hits=0, misses=0, _results=OrderedDict())
+        del state["_lock"]
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def info(self) -> MatcherCacheInfo:
+        return MatcherCacheInfo(
+            self.hits, self.misses, self.maxsize, len(self._results)
+        )
+
+
+# Patterns referring to groups by number can't be merged into a combined pattern,
+# since merging shifts the group numbers
+_GROUP_REFERENCE = re.compile(r"\\(?:[1-9]|g<)|\(\?P=|\(\?\(")
+
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+_DEFAULT_FLAGS = re.compile("").flags
+
+
+def _is_literal(pattern: re.Pattern) -> bool:
+    return pattern.flags == _DEFAULT_FLAGS and not any(
+        char in _REGEX_METACHARACTERS for char in pattern.pattern
+    )
+
+
+def _contains(literal: str):
+    return lambda string: literal in string
+
+
+def _is_mergeable(pattern: re.Pattern) -> bool:
+    return (
+        isinstance(pattern.pattern, str)
+        and pattern.flags == _DEFAULT_FLAGS
+        and not _GROUP_REFERENCE.search(pattern.pattern)
+    )
 
 
 class AccountMatcher:
-    def __init__(self, patterns: Optional[Sequence] = None):
+    """
+    Map strings to accounts using (pattern, account) rules, where the first rule
+    whose pattern matches anywhere in the string wins
+
+    All patterns are merged into a single alternation, so strings which none of the
+    rules match are rejected in one search. For the others, the alternative matching
+    at the leftmost position limits which earlier rules still need to be checked,
+    and plain literal patterns are checked with a substring test.
+
+    With cache_size, the results for the most recently matched strings are
+    remembered, which pays off for payees and descriptions that repeat a lot.
+    """
+
+    def __init__(
+        self, patterns: Optional[Sequence] = None, cache_size: Optional[int] = None
+    ):
         self.patterns = []
 
+        self._combined = None
+        self._rules_by_group = None
+        self._searches = None
+
+        self._cache = _MatcherCache(cache_size) if cache_size else None
+
         if patterns is not None:
             for regex, account in patterns:
                 self.add(regex, account)
@@ -73,10 +262,111 @@ class AccountMatcher:
     def add(self, regex: str, account: str) -> None:
         self.patterns.append(_MatcherEntry(re.compile(regex), account))
 
+        self._combined = None
+        self._searches = None
+
+        if self._cache is not None:
+            self._cache.clear()
+
+    def cache_info(self) -> Optional[MatcherCacheInfo]:
+        return self._cache.info() if self._cache is not None else None
+
+    def config(self) -> tuple:
+        """
+        The rules as plain values, e.g. for fingerprinting an importer configuration
+        """
+
+        return tuple(
+            (pattern.pattern, pattern.flags, account)
+            for pattern, account in self.patterns
+        )
+
+    def __getstate__(self) -> dict:
+        # only the rules are pickled, the combined pattern and the searches are
+        # compiled again on first use
+        state = self.__dict__.copy()
+        state.update(_combined=None, _rules_by_group=None, _searches=None)
+
+        return state
+
+    def _compile(self) -> None:
+        # _searches is assigned last, since it tells other threads matching at the
+        # same time that the rest is ready to use
+        searches = [
+            _contains(pattern.pattern) if _is_literal(pattern) else pattern.search
+            for pattern, _ in self.patterns
+        ]
+
+        if self.patterns and all(
+            _is_mergeable(pattern) for pattern, _ in self.patterns
+        ):
+            # each alternative is followed by an empty group, which is the last
+            # group closed when the alternative matches and therefore tells them
+            # apart
+            alternatives = []
+            rules_by_group = {}
+            group_index = 0
+
+            for rule_index, (pattern, _) in enumerate(self.patterns):
+                alternatives.append(f"(?:{pattern.pattern})()")
+                group_index += pattern.groups + 1
+                rules_by_group[group_index] = rule_index
+
+            self._rules_by_group = rules_by_group
+
+            try:
+                self._combined = re.compile("|".join(alternatives))
+            except re.error:
+                self._combined = None
+
+        self._searches = searches
+
+    def rule_for(self, string: str) -> Optional[int]:
+        """
+        Return the index of the first rule matching the given string
+        """
+
+        if self._cache is not None:
+            return self._cache.lookup(string, self._rule_for)
+
+        return self._rule_for(string)
+
+    def _rule_for(self, string: str) -> Optional[int]:
+        if self._searches is None:
+            self._compile()
+
+        searches = self._searches
+        candidates = len(searches)
+
+        if self._combined is not None:
+            match = self._combined.search(string)
+
+            if match is None:
+                return None
+
+            candidates = self._rules_by_group[match.lastindex]
+
+        for rule_index in range(candidates):
+            if searches[rule_index](string):
+                return rule_index
+
+        return candidates if candidates < len(searches) else None
+
+    def rule_label(self, string: str) -> Optional[str]:
+        """
+        Return the pattern of the first rule matching the given string
+        """
+
+        rule_index = self.rule_for(string)
+
+        if rule_index is not None:
+            return self.patterns[rule_index].pattern.pattern
+
     def account_for(self, string: str) -> Optional[str]:
-        for pattern, account in self.patterns:
-            if re.search(pattern, string):
-                return account
+        rule_index = self.rule_for(string)
+
+        if rule_index is not None:
+            return self.patterns[rule_index].account
 
     def account_matches(self, string: str) -> bool:
         return bool(self.account_for(string))
@@ -90,9 +380,16 @@ def _normalize_iban(value: Optional[str]) -> str:
 
 
 class IBANMatcher:
-    def __init__(self, entries: Optional[Sequence] = None):
+    def __init__(
+        self, entries: Optional[Sequence] = None, cache_size: Optional[int] = None
+    ):
         self.entries = []
 
+        # normalized IBAN -> account, keeping the first account added for an IBAN
+        self._accounts: dict[str, str] = {}
+
+        self._cache = _MatcherCache(cache_size) if cache_size else None
+
         if entries is not None:
             for iban, account in entries:
                 self.add(iban, account)
@@ -107,16 +404,43 @@ class IBANMatcher:
             return
 
         self.entries.append(_IBANMatcherEntry(normalized_iban, account))
+        self._accounts.setdefault(normalized_iban, account)
+
+        if self._cache is not None:
+            self._cache.clear()
+
+    def cache_info(self) -> Optional[MatcherCacheInfo]:
+        return self._cache.info() if self._cache is not None else None
+
+    def config(self) -> tuple:
+        """
+        The entries as plain values, e.g. for fingerprinting an importer
+        configuration
+        """
+
+        return tuple(tuple(entry) for entry in self.entries)
 
     def account_for(self, value: Optional[str]) -> Optional[str]:
+        if self._cache is not None:
+            return self._cache.lookup(value, self._account_for)
+
+        return self._account_for(value)
+
+    def _account_for(self, value: Optional[str]) -> Optional[str]:
         normalized_iban = _normalize_iban(value)
 
         if not normalized_iban:
             return None
 
-        for iban, account in self.entries:
-            if iban == normalized_iban:
-                return account
+        return self._accounts.get(normalized_iban)
+
+    def rule_label(self, value: Optional[str]) -> Optional[str]:
+        """
+        Return the (normalized) IBAN of the entry matching the given value
+        """
+
+        if self.account_for(value) is not None:
+            return _normalize_iban(value)
 
     def account_matches(self, value: Optional[str]) -> bool:
         return bool(self.account_for(value))
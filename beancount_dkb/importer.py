@@ -0,0 +1,267 @@
+import warnings
+from textwrap import dedent
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+from beancount.core import data
+from beangulp.importer import Importer
+
+from .cache import (
+    DiskCache,
+    ExtractionCache,
+    config_fingerprint,
+    copy_entries,
+    hash_file,
+    relocate_entries,
+)
+from .context import ExtractionContext, FileMetadata, LastMetadataMixin
+from .dedup import mark_duplicates
+from .exceptions import InvalidFormatError
+from .helpers import Meta
+
+if TYPE_CHECKING:
+    # opt-in features, only imported by the code that uses them
+    from .registry import ImporterRegistry
+    from .stats import ExtractionStats, FileStats
+    from .watermark import WatermarkStore
+
+
+class DKBImporter(LastMetadataMixin, Importer):
+    """
+    What ECImporter and CreditImporter have in common
+
+    Subclasses create self._v1_extractor and self._v2_extractor, and implement
+    _iter_extract(), _parse_meta() and _config().
+    """
+
+    def __init__(
+        self,
+        account_name: str,
+        currency: Optional[str],
+        file_encoding: Optional[str],
+        cache_size: int,
+        hash_content: bool,
+        stats: Optional["ExtractionStats"],
+        duplicate_window_days: int,
+        watermark: Optional["WatermarkStore"],
+        disk_cache: Optional[DiskCache],
+        registry: Optional["ImporterRegistry"],
+    ):
+        super().__init__()
+
+        self.account_name = account_name
+        self.currency = currency
+
+        self._cache = ExtractionCache(cache_size, hash_content)
+
+        self.stats = stats
+
+        self.duplicate_window_days = duplicate_window_days
+
+        self.watermark = watermark
+
+        # unlike _cache, kept across runs
+        self.disk_cache = disk_cache
+
+        # subclasses register themselves once they know their IBAN or card number
+        self.registry = registry
+
+        if file_encoding is not None:
+            warnings.warn(
+                dedent(
+                    """
+                    The file_encoding parameter is no longer being used and will be
+                    removed in a future version.
+                    """
+                ),
+                DeprecationWarning,
+            )
+
+    @property
+    def name(self):
+        return "DKB {}".format(self.__class__.__name__)
+
+    def account(self, filepath: str) -> data.Account:
+        return self.account_name
+
+    def date(self, filepath: str):
+        return self._extract_meta(filepath).date_to
+
+    def identify(self, filepath: str):
+        if self.registry is not None:
+            return self.registry.identify(self, filepath)
+
+        return self.identify_file(filepath)
+
+    def identify_file(self, filepath: str) -> bool:
+        """
+        Check whether this importer can handle the file, without asking the registry
+        """
+
+        # identifying only reads the first few bytes, so even with hash_content the
+        # file isn't hashed as a whole
+        key = ("identify", self._cache.stat_key(filepath))
+        identified = self._cache.get(key)
+
+        if identified is None:
+            identified = any(
+                extractor.identify_file(filepath)
+                for extractor in (self._v1_extractor, self._v2_extractor)
+            )
+            self._cache.set(key, identified)
+
+        return identified
+
+    def extract(self, filepath: str, existing: Optional[data.Entries] = None):
+        """
+        Extract the directives of the given file
+
+        Results are cached per file and importer configuration (see _config()). A
+        cached result is returned as is, so stats, the conflict report and matcher
+        warnings only cover the files which were actually parsed.
+        """
+
+        if self.watermark is not None:
+            # the result depends on what was imported before, so it can't be cached
+            return self._extract_file(filepath)
+
+        file_key = self._cache.key(filepath)
+        config = self._config()
+        key = ("extract", file_key, config)
+        cached = self._cache.get(key)
+
+        disk_key = None
+
+        if cached is None and self.disk_cache is not None:
+            disk_key = (
+                file_key.content_hash or hash_file(filepath),
+                config_fingerprint(config),
+            )
+            cached = self.disk_cache.get(*disk_key)
+
+            if cached is not None:
+                entries, metadata = cached
+                cached = (relocate_entries(entries, filepath), metadata)
+
+                self._cache.set(key, cached)
+                self._cache.set(("meta", file_key, config), metadata)
+
+        if cached is not None:
+            entries, metadata = cached
+            self._last_metadata = metadata
+
+            return copy_entries(entries)
+
+        entries = self._extract_file(filepath)
+
+        # _extract_file() ran in this thread, so this is the metadata of filepath
+        metadata = self._last_metadata
+        self._cache.set(key, (copy_entries(entries), metadata))
+        self._cache.set(("meta", file_key, config), metadata)
+
+        if disk_key is not None:
+            self.disk_cache.set(*disk_key, (entries, metadata))
+
+        return entries
+
+    def _config(self) -> tuple:
+        """
+        Everything about this importer that affects extracted entries
+        """
+
+        raise NotImplementedError
+
+    def deduplicate(self, entries: data.Entries, existing: data.Entries) -> None:
+        """
+        Mark the extracted entries which are already in the existing entries
+
+        See mark_duplicates() for how duplicates are found.
+        """
+
+        mark_duplicates(
+            entries, existing, self.account_name, self.duplicate_window_days
+        )
+
+    def _extract_meta(self, filepath: str) -> FileMetadata:
+        """
+        Only parse the metadata lines above the header (dates, closing balance)
+        """
+
+        key = ("meta", self._cache.key(filepath), self._config())
+        metadata = self._cache.get(key)
+
+        if metadata is None:
+            context = self._create_context(filepath)
+            self._extract_metadata(context)
+            metadata = context.metadata
+            self._cache.set(key, metadata)
+
+        self._last_metadata = metadata
+
+        return metadata
+
+    def _create_context(self, filepath: str) -> ExtractionContext:
+        for extractor in (self._v1_extractor, self._v2_extractor):
+            if extractor.identify_file(filepath):
+                return ExtractionContext(
+                    filepath, extractor, extractor.read_export(filepath)
+                )
+
+        raise InvalidFormatError()
+
+    def iter_extract(self, filepath: str) -> Iterator[data.Directive]:
+        """
+        Yield the directives of the given file one at a time, as its rows are read
+
+        The closing balance is yielded last. Unlike extract(), nothing is cached, so
+        memory usage doesn't depend on the size of the file.
+        """
+
+        if self.stats is None:
+            return self._iter_extract(self._create_context(filepath))
+
+        file_stats = self.stats.start_file(filepath)
+        context = self._create_context(filepath)
+        file_stats.lap("header")
+
+        return self._iter_extract(context, file_stats)
+
+    def _extract_file(self, filepath: str):
+        return list(self.iter_extract(filepath))
+
+    def _extract_metadata(self, context: ExtractionContext) -> int:
+        """
+        Parse the metadata lines into context.metadata and return the index of the
+        last line read
+        """
+
+        extractor = context.extractor
+
+        line_index = 0
+
+        metadata = {}
+        reader = extractor.csv_reader(context.export)(
+            extractor.extract_metadata_lines(context.export)
+        )
+
+        for line in reader:
+            line_index += 1
+
+            if not line or line == [""]:
+                continue
+
+            key, value, *_ = line
+
+            metadata[key] = Meta(value, line_index)
+
+        context.metadata = self._parse_meta(metadata)
+        self._last_metadata = context.metadata
+
+        return line_index
+
+    def _iter_extract(
+        self, context: ExtractionContext, file_stats: Optional["FileStats"] = None
+    ) -> Iterator[data.Directive]:
+        raise NotImplementedError
+
+    def _parse_meta(self, meta: Dict[str, Meta]) -> FileMetadata:
+        raise NotImplementedError
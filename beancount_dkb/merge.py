@@ -0,0 +1,173 @@
+import datetime
+import heapq
+from operator import itemgetter
+from typing import Hashable, Iterable, Iterator, Optional, Sequence
+
+from beancount.core import data
+from beangulp.importer import Importer
+
+# Exports aren't strictly ordered by the date of their directives. Credit card
+# transactions e.g. are dated by their valuation date, which can be a few days off
+# the order of the rows. Rows are only told apart from rows this many days later.
+DEFAULT_WINDOW_DAYS = 31
+
+
+def fingerprint(directive: data.Directive) -> Hashable:
+    """
+    Identify a directive by its contents, ignoring metadata like the file it was
+    read from
+    """
+
+    if isinstance(directive, data.Transaction):
+        return (
+            data.Transaction,
+            directive.date,
+            directive.payee,
+            directive.narration,
+            tuple((posting.account, posting.units) for posting in directive.postings),
+        )
+
+    if isinstance(directive, data.Balance):
+        return (data.Balance, directive.date, directive.account, directive.amount)
+
+    return (type(directive), directive.date, id(directive))
+
+
+def _booking_date(directive: data.Directive) -> datetime.date:
+    """
+    The date of the row a directive was created from
+
+    Balances are checked at the beginning of their day, so a balance created from
+    e.g. the Tagessaldo row of a day is dated the day after. It still belongs to
+    the day of the row, and is ordered among that day's transactions.
+    """
+
+    if isinstance(directive, data.Balance):
+        return directive.date - datetime.timedelta(days=1)
+
+    return directive.date
+
+
+class _Export:
+    """
+    The directives of one export, without its closing balance
+
+    The closing balance is the last directive of an export. It's held back and
+    available as closing_balance once the other directives are consumed.
+    """
+
+    def __init__(self, index: int, directives: Iterator[data.Directive]):
+        self.index = index
+        self.closing_balance: Optional[data.Balance] = None
+
+        self._directives = directives
+
+    def __iter__(self) -> Iterator[tuple[datetime.date, int, data.Directive]]:
+        previous = next(self._directives, None)
+
+        if previous is None:
+            return
+
+        for directive in self._directives:
+            yield _booking_date(previous), self.index, previous
+            previous = directive
+
+        self.closing_balance = previous
+
+
+def _closing_balance_key(export: _Export):
+    balance = export.closing_balance
+    balance_date = balance.date if balance is not None else None
+
+    return (balance_date is not None, balance_date or datetime.date.min, export.index)
+
+
+def merge_exports(
+    importer: Importer,
+    filepaths: Sequence[str],
+    window_days: Optional[int] = DEFAULT_WINDOW_DAYS,
+) -> Iterator[data.Directive]:
+    """
+    Stream the directives of several overlapping exports of the same account
+
+    The exports are merged by booking date, newest first like the DKB exports
+    themselves. Directives are considered the same if they have the same date,
+    payee, narration and postings (or the same balance), and each one is only
+    yielded as often as it occurs in any single export. So rows appearing in several
+    exports are yielded once, while e.g. two identical payments on the same day are
+    both kept.
+
+    Only the closing balance of the most recent export (the one with the latest
+    balance date) is yielded, at the very end.
+
+    The exports are read row by row, so memory usage depends on the number of files
+    and the number of rows within window_days, but not on the total number of rows.
+    The directives of an export may be out of order by up to window_days, otherwise
+    a ValueError is raised. With window_days=None, every row is remembered, and the
+    exports can be in any order.
+    """
+
+    return merge_directives(
+        (importer.iter_extract(filepath) for filepath in filepaths), window_days
+    )
+
+
+def merge_directives(
+    exports: Iterable[Iterable[data.Directive]],
+    window_days: Optional[int] = DEFAULT_WINDOW_DAYS,
+) -> Iterator[data.Directive]:
+    """
+    Merge the directives of several overlapping exports, see merge_exports()
+
+    Each export is given as its directives in the order the importer returns them,
+    with the closing balance last.
+    """
+
+    exports = [
+        _Export(index, iter(directives)) for index, directives in enumerate(exports)
+    ]
+
+    merged = heapq.merge(*exports, key=itemgetter(0), reverse=True)
+
+    # occurrences of each fingerprint per booking date, per export and overall
+    occurrences: dict[datetime.date, dict[tuple[int, Hashable], int]] = {}
+    yielded: dict[datetime.date, dict[Hashable, int]] = {}
+
+    oldest_date = None
+    # the booking dates after this one were forgotten
+    forgotten_after = None
+
+    for booking_date, index, directive in merged:
+        if forgotten_after is not None and booking_date > forgotten_after:
+            raise ValueError(
+                f"Export {index} isn't ordered by date: {booking_date} comes after "
+                f"rows more than {window_days} days older"
+            )
+
+        if window_days is not None and (
+            oldest_date is None or booking_date < oldest_date
+        ):
+            oldest_date = booking_date
+            forgotten_after = oldest_date + datetime.timedelta(days=window_days)
+
+            for day in [day for day in occurrences if day > forgotten_after]:
+                del occurrences[day]
+                del yielded[day]
+
+        day_occurrences = occurrences.setdefault(booking_date, {})
+        day_yielded = yielded.setdefault(booking_date, {})
+
+        key = fingerprint(directive)
+
+        count = day_occurrences.get((index, key), 0) + 1
+        day_occurrences[(index, key)] = count
+
+        if count > day_yielded.get(key, 0):
+            day_yielded[key] = count
+            yield directive
+
+    if exports:
+        latest = max(exports, key=_closing_balance_key)
+
+        if latest.closing_balance is not None:
+            yield latest.closing_balance
@@ -0,0 +1,165 @@
+import re
+import warnings
+from typing import Iterator, Optional, Sequence
+
+from beangulp.importer import Importer
+
+from .cache import ExtractionCache
+from .helpers import _normalize_iban
+
+# First line of the supported exports, e.g.
+#
+#   "Kontonummer:";"DE99999999999999999999 / Girokonto";
+#   "Girokonto","DE99999999999999999999"
+#   "Kreditkarte:";"1234********5678 Kreditkarte";
+#   "Karte";"Visa Kreditkarte";"1234 •••• •••• 5678"
+_FIRST_LINE = re.compile(r'^"([^"]*)"[;,]"([^"]*)"(?:[;,]"([^"]*)")?')
+
+_IBAN_LABELS = (
+    "Kontonummer:",
+    "Girokonto",
+    "Girokonto u18",
+    "Tagesgeld",
+    "DKB Festgeld",
+)
+
+_CARD_LABELS = ("Kreditkarte:", "Karte")
+
+_FIRST_LINE_SIZE = 1024
+
+
+def iban_key(iban: Optional[str]) -> Optional[str]:
+    normalized_iban = _normalize_iban(iban)
+
+    return f"iban:{normalized_iban}" if normalized_iban else None
+
+
+def card_key(card_number: Optional[str]) -> Optional[str]:
+    """
+    Cards are keyed on their first and last four digits, which is all that masked
+    card numbers (e.g. "1234********5678") have in common with the full number
+    """
+
+    normalized_card_number = _normalize_iban(card_number)
+
+    if len(normalized_card_number) < 8:
+        return None
+
+    return f"card:{normalized_card_number[:4]}{normalized_card_number[-4:]}"
+
+
+def importer_key(importer: Importer) -> Optional[str]:
+    if hasattr(importer, "card_number"):
+        return card_key(importer.card_number)
+
+    return iban_key(getattr(importer, "iban", None))
+
+
+def first_line_key(line: str) -> Optional[str]:
+    match = _FIRST_LINE.match(line)
+
+    if match is None:
+        return None
+
+    label, value, extra = match.groups()
+
+    if label in _CARD_LABELS:
+        card_number = extra if label == "Karte" else value
+
+        return card_key(card_number and card_number.removesuffix(" Kreditkarte"))
+
+    if label in _IBAN_LABELS:
+        # legacy EC exports append the account type, e.g. "DE99... / Girokonto"
+        return iban_key(value.split("/")[0])
+
+    return None
+
+
+def read_first_line(filepath: str) -> str:
+    with open(filepath, "rb") as fd:
+        raw = fd.readline(_FIRST_LINE_SIZE)
+
+    # current exports are UTF-8 with a byte order mark, legacy ones ISO-8859-1
+    try:
+        return raw.decode("utf-8-sig").strip()
+    except UnicodeDecodeError:
+        return raw.decode("ISO-8859-1").strip()
+
+
+def _identify(importer: Importer, filepath: str) -> bool:
+    # the importers of this package delegate identify() to their registry, so ask
+    # them directly
+    identify_file = getattr(importer, "identify_file", None)
+
+    if identify_file is not None:
+        return identify_file(filepath)
+
+    return importer.identify(filepath)
+
+
+class ImporterRegistry:
+    """
+    Route files to the importer configured for the account they belong to
+
+    Instead of asking every importer whether it can handle a file, the registry reads
+    the first line of the file once, extracts the IBAN or (masked) card number from
+    it and looks the importer up in a dictionary.
+
+    Importers created with registry=... register themselves, and their identify()
+    asks the registry, so a beangulp config with many importers reads the first
+    line of every file only once.
+    """
+
+    def __init__(self, importers: Optional[Sequence[Importer]] = None):
+        self._importers: dict[str, Importer] = {}
+        self._lookups = ExtractionCache(maxsize=256)
+
+        if importers is not None:
+            for importer in importers:
+                self.register(importer)
+
+    def register(self, importer: Importer) -> None:
+        key = importer_key(importer)
+
+        if key is None:
+            warnings.warn(
+                f"Ignoring {importer.name} without an IBAN or card number."
+            )
+            return
+
+        if key in self._importers:
+            warnings.warn(
+                f"Ignoring {importer.name} for {key}, which is already registered."
+            )
+            return
+
+        self._importers[key] = importer
+        self._lookups.clear()
+
+    def importer_for(self, filepath: str) -> Optional[Importer]:
+        """
+        Return the importer for the given file, or None if there isn't one
+        """
+
+        cache_key = self._lookups.key(filepath)
+        lookup = self._lookups.get(cache_key)
+
+        if lookup is None:
+            importer = self._importers.get(first_line_key(read_first_line(filepath)))
+
+            if importer is not None and not _identify(importer, filepath):
+                importer = None
+
+            lookup = (importer,)
+            self._lookups.set(cache_key, lookup)
+
+        return lookup[0]
+
+    def identify(self, importer: Importer, filepath: str) -> bool:
+        return self.importer_for(filepath) is importer
+
+    def __iter__(self) -> Iterator[Importer]:
+        return iter(self._importers.values())
+
+    def __len__(self) -> int:
+        return len(self._importers)
@@ -0,0 +1,149 @@
+import json
+from time import perf_counter
+from typing import Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+PHASES = (
+    "header",
+    "metadata",
+    "read",
+    "csv",
+    "parse",
+    "matchers",
+    "directives",
+)
+
+_EXHAUSTED = object()
+
+
+class FileStats:
+    """
+    Timings and counters collected while extracting a single file
+
+    Phases are timed as laps: lap(phase) adds the time since the previous lap to
+    the given phase. Time spent reading from iterators wrapped with timed() is only
+    added to their own phase, and time spent outside the importer (e.g. by the
+    caller consuming directives) isn't counted at all.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.phases: dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.rows = 0
+        self.rows_skipped = 0
+        self.matcher_hits: dict[str, dict[str, int]] = {}
+
+        self._last = perf_counter()
+        self._excluded = 0.0
+
+    def resume(self) -> None:
+        """
+        Start the next lap now, not counting the time since the previous one
+        """
+
+        self._last = perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = perf_counter()
+        self.phases[phase] += now - self._last
+        self._last = now
+
+    def timed(self, iterator: Iterable[T], phase: str) -> Iterator[T]:
+        """
+        Add the time spent producing each item of iterator to phase
+
+        Wrapped iterators can be nested, in which case the time of the inner one is
+        not counted again for the outer one.
+        """
+
+        iterator = iter(iterator)
+        phases = self.phases
+
+        while True:
+            excluded = self._excluded
+            start = perf_counter()
+
+            try:
+                item = next(iterator)
+            except StopIteration:
+                item = _EXHAUSTED
+
+            end = perf_counter()
+
+            phases[phase] += end - start - (self._excluded - excluded)
+            self._excluded = excluded + end - start
+            self._last = end
+
+            if item is _EXHAUSTED:
+                return
+
+            yield item
+
+    def count_match(self, matcher_name: str, rule: Optional[str]) -> None:
+        if rule is not None:
+            hits = self.matcher_hits.setdefault(matcher_name, {})
+            hits[rule] = hits.get(rule, 0) + 1
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.phases.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "filepath": str(self.filepath),
+            "seconds": self.seconds,
+            "phases": dict(self.phases),
+            "rows": self.rows,
+            "rows_skipped": self.rows_skipped,
+            "matcher_hits": {
+                matcher_name: dict(hits)
+                for matcher_name, hits in self.matcher_hits.items()
+            },
+        }
+
+
+class ExtractionStats:
+    """
+    Collect per file timings and counters from importers
+
+    Pass an instance as the stats argument of ECImporter or CreditImporter, and
+    every file extracted by them (that isn't served from the cache) adds a
+    FileStats to files.
+    """
+
+    def __init__(self):
+        self.files: list[FileStats] = []
+
+    def start_file(self, filepath: str) -> FileStats:
+        file_stats = FileStats(filepath)
+        self.files.append(file_stats)
+
+        return file_stats
+
+    def totals(self) -> dict:
+        phases = dict.fromkeys(PHASES, 0.0)
+
+        for file_stats in self.files:
+            for phase, seconds in file_stats.phases.items():
+                phases[phase] += seconds
+
+        return {
+            "files": len(self.files),
+            "seconds": sum(phases.values()),
+            "phases": phases,
+            "rows": sum(file_stats.rows for file_stats in self.files),
+            "rows_skipped": sum(file_stats.rows_skipped for file_stats in self.files),
+        }
+
+    def clear(self) -> None:
+        self.files.clear()
+
+    def to_dict(self) -> dict:
+        return {
+            "totals": self.totals(),
+            "files": [file_stats.to_dict() for file_stats in self.files],
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
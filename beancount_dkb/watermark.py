@@ -0,0 +1,288 @@
+import hashlib
+import json
+import threading
+import warnings
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Optional, Sequence
+
+from .helpers import atomic_write
+
+DEFAULT_RETENTION_DAYS = 400
+
+_VERSION = 2
+
+
+def row_fingerprint(row: Sequence[Optional[str]]) -> str:
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update("\x1f".join(value or "" for value in row).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+class RowFilter:
+    """
+    Decide which rows of a single export were already imported
+
+    Rows are identified by a fingerprint of their values. Identical rows (e.g. two
+    equal card payments on the same day) are told apart by how often they occurred
+    before in the same export, which stays the same in overlapping exports.
+    """
+
+    def __init__(
+        self,
+        known: dict[str, str],
+        horizon: Optional[date] = None,
+        ranges: Sequence[tuple[date, date]] = (),
+    ):
+        self.horizon = horizon
+        self.ranges = sorted(ranges)
+        self.skipped = 0
+
+        # the dates of the oldest and the newest row of the export, skipped or not
+        self.first_date: Optional[date] = None
+        self.last_date: Optional[date] = None
+
+        self._known = known
+        self._occurrences: dict[str, int] = {}
+        self._rows: dict[str, str] = {}
+        self._range_starts = [start for start, _ in self.ranges]
+
+    def skip(self, row: Sequence[Optional[str]], row_date: date) -> bool:
+        fingerprint = row_fingerprint(row)
+
+        occurrence = self._occurrences.get(fingerprint, 0)
+        self._occurrences[fingerprint] = occurrence + 1
+
+        if occurrence:
+            fingerprint = f"{fingerprint}-{occurrence}"
+
+        if self.first_date is None or row_date < self.first_date:
+            self.first_date = row_date
+
+        if self.last_date is None or row_date > self.last_date:
+            self.last_date = row_date
+
+        if fingerprint in self._known or self._imported_before_horizon(row_date):
+            self.skipped += 1
+            return True
+
+        self._rows[fingerprint] = row_date.isoformat()
+
+        return False
+
+    def _imported_before_horizon(self, row_date: date) -> bool:
+        """
+        Rows older than the horizon no longer have their fingerprints stored, so
+        they are skipped if an export covering their date was imported before
+        """
+
+        if self.horizon is None or row_date >= self.horizon:
+            return False
+
+        index = bisect_right(self._range_starts, row_date) - 1
+
+        return index >= 0 and row_date <= self.ranges[index][1]
+
+    @property
+    def rows(self) -> dict[str, str]:
+        """
+        Fingerprints and dates of the rows that weren't skipped
+        """
+
+        return self._rows
+
+
+def _add_range(ranges: list, first: str, last: str) -> list:
+    """
+    Add the range first-last (ISO dates) to the sorted ranges, merging ranges that
+    overlap or touch
+    """
+
+    merged: list = []
+
+    for start, end in sorted([*ranges, [first, last]]):
+        if merged:
+            previous_end = date.fromisoformat(merged[-1][1])
+
+            if date.fromisoformat(start) <= previous_end + timedelta(days=1):
+                merged[-1][1] = max(merged[-1][1], end)
+                continue
+
+        merged.append([start, end])
+
+    return merged
+
+
+def _migrate_v1(accounts: dict) -> dict:
+    # version 1 skipped every row between the oldest and the horizon, which
+    # doesn't mean that every date in between was imported. Without knowing which
+    # dates were, only the fingerprints are kept.
+    return {
+        key: {"latest": account["latest"], "ranges": [], "rows": account["rows"]}
+        for key, account in accounts.items()
+    }
+
+
+class WatermarkStore:
+    """
+    Remember which export rows were already imported, per account
+
+    The store is a JSON file mapping an IBAN or card number to the date ranges
+    covered by the imported exports, the date of the latest imported row, and the
+    fingerprints of the rows imported within the last retention_days before the
+    latest one. Rows older than that horizon are skipped if their date lies within
+    one of the imported ranges. Rows outside of them, e.g. from an archive imported
+    after the recent exports, are always extracted.
+
+    Rows count as imported once an importer has extracted all rows of their export,
+    but only in memory. They're written to the file by save(), which should be
+    called once the extracted entries were added to the ledger, so that a dry run
+    doesn't lose any rows. With autosave=True, every extracted export is saved
+    right away.
+
+    The file only speeds up imports of overlapping exports. It's safe to delete, in
+    which case the next import extracts everything again. It isn't meant to be
+    written to by several processes at once, but can be shared between threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        retention_days: int = DEFAULT_RETENTION_DAYS,
+        autosave: bool = False,
+    ):
+        self.path = path
+        self.retention_days = retention_days
+        self.autosave = autosave
+
+        self._accounts: Optional[dict] = None
+        self._lock = threading.RLock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def _load(self) -> dict:
+        with self._lock:
+            return self._load_accounts()
+
+    def _load_accounts(self) -> dict:
+        if self._accounts is None:
+            try:
+                with open(self.path, encoding="utf-8") as fd:
+                    content = json.load(fd)
+
+                version = content.get("version")
+
+                if version == 1:
+                    self._accounts = _migrate_v1(content["accounts"])
+                elif version == _VERSION:
+                    self._accounts = content["accounts"]
+                else:
+                    raise ValueError(f"Unsupported version {version}")
+            except FileNotFoundError:
+                self._accounts = {}
+            except (KeyError, ValueError, AttributeError) as exc:
+                warnings.warn(
+                    f"Ignoring unreadable watermark store {self.path}: {exc}"
+                )
+                self._accounts = {}
+
+        return self._accounts
+
+    def latest(self, key: str) -> Optional[date]:
+        account = self._load().get(key)
+
+        if account is None:
+            return None
+
+        return date.fromisoformat(account["latest"])
+
+    def row_filter(self, key: str) -> RowFilter:
+        with self._lock:
+            account = self._load().get(key)
+
+            if account is None:
+                return RowFilter({})
+
+            horizon = date.fromisoformat(account["latest"]) - timedelta(
+                days=self.retention_days
+            )
+
+            # a copy, since update() may replace the rows while the filter is used
+            return RowFilter(
+                dict(account["rows"]),
+                horizon,
+                [
+                    (date.fromisoformat(start), date.fromisoformat(end))
+                    for start, end in account["ranges"]
+                ],
+            )
+
+    def update(self, key: str, row_filter: RowFilter) -> None:
+        """
+        Record the rows let through by row_filter as imported, and save the store
+        with autosave
+        """
+
+        if row_filter.first_date is None:
+            return
+
+        with self._lock:
+            self._update(key, row_filter)
+
+            if self.autosave:
+                self.save()
+
+    def _update(self, key: str, row_filter: RowFilter) -> None:
+        accounts = self._load()
+        account = accounts.setdefault(key, {"latest": None, "ranges": [], "rows": {}})
+
+        rows = account["rows"]
+        rows.update(row_filter.rows)
+
+        latest = row_filter.last_date.isoformat()
+
+        if account["latest"] is not None:
+            latest = max(latest, account["latest"])
+
+        horizon = (
+            date.fromisoformat(latest) - timedelta(days=self.retention_days)
+        ).isoformat()
+
+        account["latest"] = latest
+        account["ranges"] = _add_range(
+            account["ranges"],
+            row_filter.first_date.isoformat(),
+            row_filter.last_date.isoformat(),
+        )
+        account["rows"] = {
+            fingerprint: row_date
+            for fingerprint, row_date in rows.items()
+            if row_date >= horizon
+        }
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        content = json.dumps({"version": _VERSION, "accounts": self._load()})
+
+        atomic_write(self.path, content.encode("utf-8"))
+
+    def clear(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._accounts = {}
+            else:
+                self._load().pop(key, None)
+
+            self.save()
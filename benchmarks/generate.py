@@ -0,0 +1,262 @@
+"""
+Generate synthetic DKB exports for benchmarking
+
+The generated files follow the layout of the real exports (metadata block, header,
+transactions in descending date order) and are fully determined by the format, the
+delimiter, the number of rows and the seed.
+
+    python -m benchmarks.generate ec-v2 100000 /tmp/ec-v2.csv --delimiter ,
+"""
+
+import argparse
+import random
+from datetime import date, timedelta
+
+from beancount_dkb.extractors import credit, ec
+
+IBAN = "DE99999999999999999999"
+
+CARD_NUMBER_V1 = "1234********5678"
+
+CARD_NUMBER_V2 = "1234 •••• •••• 5678"
+
+FORMATS = ("ec-v1", "ec-v2", "credit-v1", "credit-v2")
+
+_END_DATE = date(2023, 6, 30)
+
+_PAYEES = (
+    "REWE Filialen Voll",
+    "EDEKA//MUENCHEN/DE",
+    "DB Vertrieb GmbH",
+    "Stadtwerke Muenchen GmbH",
+    "Amazon Payments Europe S.C.A.",
+    "PayPal Europe S.a.r.l. et Cie S.C.A",
+    "Lidl sagt Danke",
+    "Arbeitgeber GmbH",
+    "Vodafone GmbH",
+    "Mustermann, Max                    Musterstr. 1 80331 Muenchen",
+)
+
+_WORDS = (
+    "Lastschrift",
+    "Rechnung",
+    "Kundennummer",
+    "Vertragskonto",
+    "Abschlag",
+    "Gutschrift",
+    "Referenz",
+    "Zahlung",
+    "Danke",
+    "Filiale",
+    "Einkauf",
+    "Monat",
+)
+
+
+def _amount(rng: random.Random) -> float:
+    if rng.random() < 0.1:
+        return rng.uniform(100, 5000)
+
+    return -rng.uniform(0.5, 250)
+
+
+def _fmt_de(value: float) -> str:
+    return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _purpose(rng: random.Random) -> str:
+    # most purposes are short, but some are long SEPA remittance texts
+    words = rng.randint(1, 4) if rng.random() < 0.8 else rng.randint(20, 40)
+
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+
+    return f"{text} {rng.randrange(10**9):09d}"
+
+
+def _iban(rng: random.Random) -> str:
+    return f"DE{rng.randrange(10**20):020d}"
+
+
+def _dates(rows: int):
+    """
+    Yield one date per row, newest first, spread over about a year
+    """
+
+    rows_per_day = max(1, rows // 365)
+
+    for index in range(rows):
+        yield _END_DATE - timedelta(days=index // rows_per_day)
+
+
+def _row(fields, delimiter: str, trailing: str = "") -> str:
+    return delimiter.join(f'"{field}"' for field in fields) + trailing
+
+
+def _ec_v1(rng: random.Random, rows: int, delimiter: str) -> list[str]:
+    start = _END_DATE - timedelta(days=(rows - 1) // max(1, rows // 365))
+
+    lines = [
+        f'"Kontonummer:";"{IBAN} / Girokonto";',
+        "",
+        f'"Von:";"{start:%d.%m.%Y}";',
+        f'"Bis:";"{_END_DATE:%d.%m.%Y}";',
+        f'"Kontostand vom {_END_DATE:%d.%m.%Y}:";"5.000,01 EUR";',
+        "",
+        _row(ec.V1Extractor.FIELDS, ";", ";"),
+    ]
+
+    previous = None
+
+    for booking_date in _dates(rows):
+        day = f"{booking_date:%d.%m.%Y}"
+
+        if previous is not None and day != previous:
+            fields = (previous, "", "", "", "Tagessaldo", "", "", "4.321,00")
+            fields += ("",) * (len(ec.V1Extractor.FIELDS) - len(fields))
+        else:
+            fields = (
+                day,
+                day,
+                rng.choice(("Lastschrift", "Kartenzahlung", "Gutschrift")),
+                rng.choice(_PAYEES),
+                _purpose(rng),
+                _iban(rng),
+                "BYLADEM1001",
+                _fmt_de(_amount(rng)),
+                "",
+                "",
+                "",
+            )
+
+        previous = day
+        lines.append(_row(fields, ";", ";"))
+
+    return lines
+
+
+def _ec_v2(rng: random.Random, rows: int, delimiter: str) -> list[str]:
+    lines = [
+        _row(("Girokonto", IBAN), delimiter),
+        '""',
+        _row((f"Kontostand vom {_END_DATE:%d.%m.%Y}:", "5.000,01 EUR"), delimiter),
+        '""',
+        _row(ec.V2Extractor.FIELDS, delimiter),
+    ]
+
+    for booking_date in _dates(rows):
+        day = f"{booking_date:%d.%m.%y}"
+        amount = _amount(rng)
+        payee = rng.choice(_PAYEES)
+
+        if rng.random() < 0.01:
+            purpose = "Tagessaldo"
+        else:
+            purpose = _purpose(rng)
+
+        fields = (
+            day,
+            day,
+            "Gebucht",
+            payee if amount > 0 else "ISSUER",
+            "ISSUER" if amount > 0 else payee,
+            purpose,
+            "Eingang" if amount > 0 else "Ausgang",
+            _iban(rng),
+            f"{_fmt_de(amount)}\xa0€",
+            "",
+            "",
+            "",
+        )
+        lines.append(_row(fields, delimiter))
+
+    return lines
+
+
+def _credit_v1(rng: random.Random, rows: int, delimiter: str) -> list[str]:
+    start = _END_DATE - timedelta(days=(rows - 1) // max(1, rows // 365))
+
+    lines = [
+        f'"Kreditkarte:";"{CARD_NUMBER_V1} Kreditkarte";',
+        "",
+        f'"Von:";"{start:%d.%m.%Y}";',
+        f'"Bis:";"{_END_DATE:%d.%m.%Y}";',
+        '"Saldo:";"5000.01 EUR";',
+        f'"Datum:";"{_END_DATE:%d.%m.%Y}";',
+        "",
+        _row(credit.V1Extractor.FIELDS, ";", ";"),
+    ]
+
+    for booking_date in _dates(rows):
+        day = f"{booking_date:%d.%m.%Y}"
+        fields = ("Ja", day, day, _purpose(rng), _fmt_de(_amount(rng)), "")
+        lines.append(_row(fields, ";", ";"))
+
+    return lines
+
+
+def _credit_v2(rng: random.Random, rows: int, delimiter: str) -> list[str]:
+    lines = [
+        _row(("Karte", "Visa Kreditkarte", CARD_NUMBER_V2), delimiter),
+        '""',
+        _row((f"Saldo vom {_END_DATE:%d.%m.%Y}:", "5.000,01 EUR"), delimiter),
+        '""',
+        _row(credit.V2Extractor.FIELDS, delimiter),
+    ]
+
+    for booking_date in _dates(rows):
+        day = f"{booking_date:%d.%m.%y}"
+        fields = (
+            day,
+            day,
+            "Gebucht",
+            _purpose(rng),
+            "Im Geschäft",
+            f"{_fmt_de(_amount(rng))}\xa0€",
+            "",
+        )
+        lines.append(_row(fields, delimiter))
+
+    return lines
+
+
+_GENERATORS = {
+    "ec-v1": (_ec_v1, ec.V1Extractor.file_encoding),
+    "ec-v2": (_ec_v2, ec.V2Extractor.file_encoding),
+    "credit-v1": (_credit_v1, credit.V1Extractor.file_encoding),
+    "credit-v2": (_credit_v2, credit.V2Extractor.file_encoding),
+}
+
+
+def generate(
+    filepath: str, format: str, rows: int, delimiter: str = ";", seed: int = 0
+) -> None:
+    """
+    Write a synthetic export with the given number of transaction rows
+
+    V1 exports always use ";", so delimiter only applies to V2 exports.
+    """
+
+    generator, encoding = _GENERATORS[format]
+
+    lines = generator(random.Random(seed), rows, delimiter)
+
+    with open(filepath, "w", encoding=encoding, newline="") as fd:
+        fd.write("\n".join(lines))
+        fd.write("\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("format", choices=FORMATS)
+    parser.add_argument("rows", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--delimiter", choices=(",", ";"), default=";")
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+
+    generate(args.output, args.format, args.rows, args.delimiter, args.seed)
+
+
+if __name__ == "__main__":
+    main()
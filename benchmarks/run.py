@@ -0,0 +1,224 @@
+"""
+Benchmark identify, date and extract on synthetic DKB exports
+
+For every format, delimiter and size, a seeded export is generated and each
+operation is timed on a fresh importer (with caching disabled), reporting the best
+of a few runs as rows per second. Peak memory is measured in a separate run under
+tracemalloc, so that it doesn't skew the timings.
+
+    python -m benchmarks.run --sizes 100 10000 --json results.json
+    python -m benchmarks.run --compare results.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+from typing import Callable, NamedTuple
+
+from beancount_dkb import CreditImporter, ECImporter
+
+from .generate import CARD_NUMBER_V1, CARD_NUMBER_V2, FORMATS, IBAN, generate
+
+OPERATIONS = ("identify", "date", "extract")
+
+DEFAULT_SIZES = (100, 1_000, 10_000, 100_000)
+
+_PAYEE_PATTERNS = [
+    ("REWE", "Expenses:Supermarket:REWE"),
+    ("EDEKA", "Expenses:Supermarket:EDEKA"),
+    (r"Stadtwerke\s+Muenchen", "Expenses:Utilities"),
+    ("DB Vertrieb", "Expenses:Travel"),
+]
+
+_DESCRIPTION_PATTERNS = [
+    ("Vertragskonto", "Expenses:Utilities"),
+    (r"Abschlag \d+", "Expenses:Utilities"),
+]
+
+_IBAN_MATCHER = [
+    ("DE00000000000000000000", "Assets:Savings"),
+]
+
+
+class Result(NamedTuple):
+    format: str
+    delimiter: str
+    rows: int
+    operation: str
+    seconds: float
+    rows_per_second: float
+    peak_bytes: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.format} {self.delimiter} {self.rows} {self.operation}"
+
+
+def _importer(format: str):
+    if format.startswith("ec"):
+        return ECImporter(
+            IBAN,
+            "Assets:DKB:EC",
+            payee_patterns=_PAYEE_PATTERNS,
+            iban_matcher=_IBAN_MATCHER,
+            cache_size=0,
+        )
+
+    return CreditImporter(
+        CARD_NUMBER_V1 if format == "credit-v1" else CARD_NUMBER_V2,
+        "Assets:DKB:Credit",
+        description_patterns=_DESCRIPTION_PATTERNS,
+        cache_size=0,
+    )
+
+
+def _run(format: str, operation: str, filepath: str) -> None:
+    result = getattr(_importer(format), operation)(filepath)
+
+    # date() is None for exports without a date range, e.g. EC V2
+    if not result and operation != "date":
+        raise RuntimeError(f"{operation} failed for {filepath}")
+
+
+def _time(run: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def _peak_memory(run: Callable[[], object]) -> int:
+    tracemalloc.start()
+
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def benchmark(
+    format: str, delimiter: str, rows: int, directory: str, repeat: int = 3
+) -> list[Result]:
+    filepath = os.path.join(directory, f"{format}-{ord(delimiter)}-{rows}.csv")
+    generate(filepath, format, rows, delimiter)
+
+    results = []
+
+    for operation in OPERATIONS:
+        run = partial(_run, format, operation, filepath)
+
+        # large files are slow enough that a single run is representative
+        seconds = _time(run, repeat if rows <= 100_000 else 1)
+
+        results.append(
+            Result(
+                format,
+                delimiter,
+                rows,
+                operation,
+                seconds,
+                rows / seconds,
+                _peak_memory(run),
+            )
+        )
+
+    return results
+
+
+def _print(result: Result) -> None:
+    print(
+        f"{result.format:<10} {result.delimiter:<3} {result.rows:>9} "
+        f"{result.operation:<9} {result.seconds * 1000:>11.2f} "
+        f"{result.rows_per_second:>14,.0f} {result.peak_bytes / 1024:>12,.0f}"
+    )
+
+
+def _compare(results: list[Result], baseline_path: str, tolerance: float) -> int:
+    """
+    Report operations that got slower than the baseline by more than tolerance
+    """
+
+    with open(baseline_path) as fd:
+        baseline = {
+            Result(**result).key: Result(**result) for result in json.load(fd)
+        }
+
+    regressions = 0
+
+    for result in results:
+        previous = baseline.get(result.key)
+
+        if previous is None:
+            continue
+
+        if result.rows_per_second < previous.rows_per_second * (1 - tolerance):
+            regressions += 1
+            print(
+                f"REGRESSION {result.key}: {result.rows_per_second:,.0f} rows/s, "
+                f"was {previous.rows_per_second:,.0f} rows/s",
+                file=sys.stderr,
+            )
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument(
+        "--delimiters", nargs="+", choices=(",", ";"), default=(",", ";")
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument(
+        "--compare", help="compare against results written by --json"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2)
+
+    args = parser.parse_args()
+
+    print(
+        f"{'format':<10} {'sep':<3} {'rows':>9} {'operation':<9} {'ms':>11} "
+        f"{'rows/s':>14} {'peak KiB':>12}"
+    )
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for format in args.formats:
+            # V1 exports always use ";"
+            delimiters = (";",) if format.endswith("v1") else args.delimiters
+
+            for delimiter in delimiters:
+                for rows in args.sizes:
+                    for result in benchmark(
+                        format, delimiter, rows, directory, args.repeat
+                    ):
+                        _print(result)
+                        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as fd:
+            json.dump([result._asdict() for result in results], fd, indent=2)
+
+    if args.compare:
+        return 1 if _compare(results, args.compare, args.tolerance) else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+from textwrap import dedent
+
+from beancount_dkb.extractors.credit import V2Extractor as CreditV2Extractor
+from beancount_dkb.extractors.ec import V2Extractor
+
+IBAN = "DE99999999999999999999"
+
+OTHER_IBAN = "DE88888888888888888888"
+
+CARD_NUMBER = "1234 •••• •••• 5678"
+
+# the ";" separated variants
+EC_HEADER = V2Extractor(IBAN)._get_possible_headers()[1]
+
+CREDIT_HEADER = CreditV2Extractor(CARD_NUMBER)._get_possible_headers()[1]
+
+
+def ec_row(
+    day, payee="EDEKA", amount="-8,67", description=None, type_="Ausgang", iban=""
+):
+    if description is None:
+        description = f"{payee} SAGT DANKE"
+
+    return (
+        f'"{day}";"{day}";"Gebucht";"ISSUER";"{payee}";"{description}";'
+        f'"{type_}";"{iban}";"{amount}";"";"";""'
+    )
+
+
+def credit_row(day, description, amount, type_="Im Geschäft", valuation_day=None):
+    return (
+        f'"{day}";"{valuation_day or day}";"Gebucht";"{description}";'
+        f'"{type_}";"{amount}";""'
+    )
+
+
+def write_ec_export(
+    tmp_file, rows, iban=IBAN, balance="5.001,01 EUR", balance_date="30.06.2023"
+):
+    """
+    Write a V2 export of a checking account with the given rows
+    """
+
+    tmp_file.write_text(
+        dedent(
+            f"""
+            "Girokonto";"{iban}"
+            ""
+            "Kontostand vom {balance_date}:";"{balance}"
+            ""
+            {EC_HEADER.value}
+            """
+        ).lstrip()
+        + "".join(f"{row}\n" for row in rows),
+        encoding="utf-8-sig",
+    )
+
+    return tmp_file
+
+
+def write_credit_export(
+    tmp_file, rows, balance="5.000,01 EUR", balance_date="30.06.2023"
+):
+    """
+    Write a V2 export of the credit card with the given rows
+    """
+
+    tmp_file.write_text(
+        dedent(
+            f"""
+            "Karte";"Visa Kreditkarte";"{CARD_NUMBER}"
+            ""
+            "Saldo vom {balance_date}:";"{balance}"
+            ""
+            {CREDIT_HEADER.value}
+            """
+        ).lstrip()
+        + "".join(f"{row}\n" for row in rows),
+        encoding="utf-8-sig",
+    )
+
+    return tmp_file
@@ -0,0 +1,126 @@
+import pickle
+from decimal import Decimal
+
+import pytest
+from beancount.core.data import Balance, Transaction
+from conftest import IBAN, OTHER_IBAN, ec_row, write_ec_export
+
+from beancount_dkb import ECImporter
+from beancount_dkb.batch import extract_many
+from beancount_dkb.stats import ExtractionStats
+from beancount_dkb.watermark import WatermarkStore
+
+
+def _write(tmp_file, iban, type_="Ausgang", amount="-8,67"):
+    return write_ec_export(
+        tmp_file,
+        [ec_row("15.06.23", amount=amount, type_=type_, iban="DE00000000000000000000")],
+        iban=iban,
+    )
+
+
+@pytest.fixture
+def importers():
+    return [
+        ECImporter(
+            IBAN,
+            "Assets:DKB:EC",
+            payee_patterns=[("EDEKA", "Expenses:Supermarket")],
+        ),
+        ECImporter(OTHER_IBAN, "Assets:DKB:Other"),
+    ]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    unknown = tmp_path / "unknown.csv"
+    unknown.write_text('"Datum";"Betrag"\n')
+
+    return [
+        _write(tmp_path / "other.csv", OTHER_IBAN),
+        _write(tmp_path / "corrupt.csv", IBAN, type_="Unbekannt"),
+        unknown,
+        _write(tmp_path / "ec.csv", IBAN),
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_extract_many(importers, paths, workers):
+    results = extract_many(importers, paths, workers=workers)
+
+    assert [result.filepath for result in results] == [str(path) for path in paths]
+
+    other, corrupt, unknown, ec = results
+
+    assert other.importer_index == 1
+    assert other.account == "Assets:DKB:Other"
+    assert other.error is None
+    assert [type(entry) for entry in other.entries] == [Transaction, Balance]
+
+    assert corrupt.importer_index == 0
+    assert corrupt.entries == []
+    assert corrupt.error == "InvalidFormatError: Unknown Umsatztyp: Unbekannt"
+
+    assert unknown.importer_index is None
+    assert unknown.entries == []
+    assert unknown.error is None
+
+    assert ec.importer_index == 0
+    assert ec.error is None
+    assert ec.entries[0].postings[0].units.number == Decimal("-8.67")
+    assert ec.entries[0].postings[1].account == "Expenses:Supermarket"
+
+
+def test_pickled_importer_drops_cached_state(importers, paths):
+    importer = importers[0]
+    importer.extract(paths[3])
+
+    assert len(importer._cache) > 0
+    assert importer.payee_matcher._searches is not None
+
+    copy = pickle.loads(pickle.dumps(importer))
+
+    assert len(copy._cache) == 0
+    assert copy.payee_matcher._searches is None
+    assert copy.extract(paths[3]) == importer.extract(paths[3])
+
+
+def test_extract_many_collects_stats_and_conflicts_from_workers(paths):
+    stats = ExtractionStats()
+    importers = [
+        ECImporter(
+            IBAN,
+            "Assets:DKB:EC",
+            payee_patterns=[("EDEKA", "Expenses:Supermarket")],
+            description_patterns=[("DANKE", "Expenses:Other")],
+            matcher_conflicts="report",
+            stats=stats,
+        ),
+        ECImporter(OTHER_IBAN, "Assets:DKB:Other", stats=stats),
+    ]
+
+    extract_many(importers, paths, workers=2)
+
+    assert [file_stats.filepath for file_stats in stats.files] == [
+        str(paths[0]),
+        str(paths[1]),
+        str(paths[3]),
+    ]
+    assert stats.totals()["rows"] == 3
+
+    [conflict] = importers[0].conflicts.to_dict()
+
+    assert conflict["count"] == 1
+    assert conflict["samples"] == [{"filepath": str(paths[3]), "line": 6}]
+    assert len(importers[1].conflicts) == 0
+
+
+def test_extract_many_with_watermark_needs_one_worker(tmp_path, paths):
+    importer = ECImporter(
+        IBAN, "Assets:DKB:EC", watermark=WatermarkStore(tmp_path / "watermark.json")
+    )
+
+    with pytest.raises(ValueError, match="workers=1"):
+        extract_many([importer], paths, workers=2)
+
+    assert extract_many([importer], paths, workers=1)[3].error is None
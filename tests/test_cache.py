@@ -0,0 +1,265 @@
+import datetime
+import shutil
+from decimal import Decimal
+
+import pytest
+from conftest import (
+    CARD_NUMBER,
+    IBAN,
+    credit_row,
+    ec_row,
+    write_credit_export,
+    write_ec_export,
+)
+
+from beancount_dkb import CreditImporter, ECImporter
+from beancount_dkb.cache import DiskCache, ExtractionCache, file_key
+
+
+def _write_export(tmp_file, balance="5.000,01 EUR"):
+    write_ec_export(tmp_file, [ec_row("15.06.23")], balance=balance)
+
+
+def test_extraction_cache_evicts_least_recently_used():
+    cache = ExtractionCache(maxsize=2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_file_key_changes_with_content(tmp_path):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+
+    _write_export(tmp_file)
+    key = file_key(tmp_file, hash_content=True)
+
+    _write_export(tmp_file, balance="6.000,01 EUR")
+
+    assert file_key(tmp_file, hash_content=True) != key
+
+
+def test_date_and_extract_share_one_parse(tmp_path, monkeypatch):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    calls = []
+    extract_file = importer._extract_file
+
+    def _extract_file(filepath):
+        calls.append(filepath)
+        return extract_file(filepath)
+
+    monkeypatch.setattr(importer, "_extract_file", _extract_file)
+
+    assert importer.identify(tmp_file)
+    assert importer.date(tmp_file) is None
+    directives = importer.extract(tmp_file)
+
+    assert len(calls) == 1
+    assert len(directives) == 2
+    assert importer._balance_date == datetime.date(2023, 7, 1)
+
+
+def test_identify_does_not_hash_content(tmp_path, monkeypatch):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC", hash_content=True)
+
+    hashed = []
+    monkeypatch.setattr("beancount_dkb.cache.hash_file", hashed.append)
+
+    assert importer.identify(tmp_file)
+    assert importer.identify(tmp_file)
+    assert hashed == []
+
+
+def test_cached_entries_do_not_share_metadata(tmp_path):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    directives = importer.extract(tmp_file)
+    directives[0].meta["__duplicate__"] = True
+
+    assert "__duplicate__" not in importer.extract(tmp_file)[0].meta
+
+
+def test_cached_entries_do_not_share_postings(tmp_path):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    directives = importer.extract(tmp_file)
+    directives[0].postings.append(directives[0].postings[0])
+
+    assert len(importer.extract(tmp_file)[0].postings) == 1
+
+
+def test_cache_depends_on_config(tmp_path):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    assert len(importer.extract(tmp_file)[0].postings) == 1
+
+    importer.payee_matcher.add(".*", "Expenses:All")
+
+    assert len(importer.extract(tmp_file)[0].postings) == 2
+
+
+def test_cache_can_be_disabled(tmp_path):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC", cache_size=0)
+    importer.extract(tmp_file)
+
+    assert len(importer._cache) == 0
+
+
+def _count_extractions(importer, monkeypatch):
+    calls = []
+    extract_file = importer._extract_file
+
+    def _extract_file(filepath):
+        calls.append(filepath)
+        return extract_file(filepath)
+
+    monkeypatch.setattr(importer, "_extract_file", _extract_file)
+
+    return calls
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    return DiskCache(tmp_path / "cache")
+
+
+def test_disk_cache_is_shared_between_importers(tmp_path, disk_cache, monkeypatch):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    patterns = [("EDEKA", "Expenses:Supermarket")]
+
+    directives = ECImporter(
+        IBAN, "Assets:DKB:EC", payee_patterns=patterns, disk_cache=disk_cache
+    ).extract(tmp_file)
+
+    importer = ECImporter(
+        IBAN, "Assets:DKB:EC", payee_patterns=patterns, disk_cache=disk_cache
+    )
+    calls = _count_extractions(importer, monkeypatch)
+
+    assert importer.extract(tmp_file) == directives
+    assert importer.date(tmp_file) is None
+    assert importer._balance_date == datetime.date(2023, 7, 1)
+    assert calls == []
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"payee_patterns": [("EDEKA", "Expenses:Food")]},
+        {"currency": "USD"},
+        {"meta_code": "code"},
+        {"matcher_priority": ["payee_patterns"]},
+    ],
+)
+def test_disk_cache_depends_on_config(tmp_path, disk_cache, monkeypatch, options):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    ECImporter(IBAN, "Assets:DKB:EC", disk_cache=disk_cache).extract(tmp_file)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC", disk_cache=disk_cache, **options)
+    calls = _count_extractions(importer, monkeypatch)
+
+    importer.extract(tmp_file)
+
+    assert calls == [tmp_file]
+
+
+def test_disk_cache_depends_on_content(tmp_path, disk_cache, monkeypatch):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    ECImporter(IBAN, "Assets:DKB:EC", disk_cache=disk_cache).extract(tmp_file)
+
+    _write_export(tmp_file, balance="6.000,01 EUR")
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC", disk_cache=disk_cache)
+    calls = _count_extractions(importer, monkeypatch)
+
+    assert importer.extract(tmp_file)[-1].amount.number == Decimal("6000.01")
+    assert calls == [tmp_file]
+
+
+def test_disk_cache_points_entries_at_the_extracted_file(tmp_path, disk_cache):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    copy = tmp_path / "copy.csv"
+    shutil.copy(tmp_file, copy)
+
+    ECImporter(IBAN, "Assets:DKB:EC", disk_cache=disk_cache).extract(tmp_file)
+    directives = ECImporter(IBAN, "Assets:DKB:EC", disk_cache=disk_cache).extract(
+        copy
+    )
+
+    assert [directive.meta["filename"] for directive in directives] == [copy, copy]
+
+
+def test_corrupt_disk_cache_entries_are_ignored(tmp_path, disk_cache):
+    tmp_file = tmp_path / f"{IBAN}.csv"
+    _write_export(tmp_file)
+
+    directives = ECImporter(IBAN, "Assets:DKB:EC", disk_cache=disk_cache).extract(
+        tmp_file
+    )
+
+    for path in (tmp_path / "cache").glob("*/*.pickle.z"):
+        path.write_bytes(b"garbage")
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC", disk_cache=disk_cache)
+
+    assert importer.extract(tmp_file) == directives
+
+    disk_cache.clear()
+
+    assert list((tmp_path / "cache").glob("*/*.pickle.z")) == []
+
+
+def test_credit_importer_disk_cache(tmp_path, disk_cache, monkeypatch):
+    tmp_file = write_credit_export(
+        tmp_path / "credit.csv",
+        [credit_row("14.01.23", "Ausgleich Kreditkarte gem", "138,98", "Lastschrift")],
+    )
+
+    CreditImporter(CARD_NUMBER, "Assets:DKB:Credit", disk_cache=disk_cache).extract(
+        tmp_file
+    )
+
+    importer = CreditImporter(
+        CARD_NUMBER,
+        "Assets:DKB:Credit",
+        ignore_credit_card_settlements=True,
+        disk_cache=disk_cache,
+    )
+    calls = _count_extractions(importer, monkeypatch)
+
+    assert len(importer.extract(tmp_file)) == 1
+    assert calls == [tmp_file]
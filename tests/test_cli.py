@@ -0,0 +1,218 @@
+import json
+
+import pytest
+from conftest import (
+    CARD_NUMBER,
+    CREDIT_HEADER,
+    IBAN,
+    credit_row,
+    ec_row,
+    write_credit_export,
+    write_ec_export,
+)
+
+from beancount_dkb.cli import find_exports, load_importers, main
+
+
+@pytest.fixture
+def exports(tmp_path):
+    directory = tmp_path / "exports"
+    (directory / "2023").mkdir(parents=True)
+
+    write_ec_export(
+        directory / "2023" / "ec.csv",
+        [ec_row("15.06.23"), ec_row("14.06.23", "REWE", "-2,00")],
+    )
+    write_credit_export(
+        directory / "credit.csv",
+        [credit_row("15.01.23", "REWE Filiale Muenchen", "-10,80 €")],
+        balance_date="31.01.2023",
+    )
+    (directory / "unknown.csv").write_text('"Datum";"Betrag"\n')
+
+    return directory
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = tmp_path / "accounts.json"
+    config.write_text(
+        json.dumps(
+            [
+                {
+                    "iban": IBAN,
+                    "account": "Assets:DKB:EC",
+                    "payee_patterns": [["EDEKA", "Expenses:Supermarket"]],
+                },
+                {"card_number": CARD_NUMBER, "account": "Liabilities:DKB:Visa"},
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+    return config
+
+
+def test_load_importers(config):
+    ec_importer, credit_importer = load_importers(config)
+
+    assert ec_importer.account_name == "Assets:DKB:EC"
+    assert ec_importer.payee_matcher.account_for("EDEKA") == "Expenses:Supermarket"
+    assert credit_importer.account_name == "Liabilities:DKB:Visa"
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "{}",
+        '[{"iban": "DE99"}]',
+        '[{"account": "Assets:DKB:EC"}]',
+        '[{"iban": "DE99", "account": "Assets:DKB:EC", "unknown": 1}]',
+    ],
+)
+def test_load_invalid_config(tmp_path, content):
+    config = tmp_path / "accounts.json"
+    config.write_text(content)
+
+    with pytest.raises(ValueError):
+        load_importers(config)
+
+
+def test_find_exports(exports):
+    expected = [
+        str(exports / "2023" / "ec.csv"),
+        str(exports / "credit.csv"),
+        str(exports / "unknown.csv"),
+    ]
+
+    assert find_exports([str(exports)]) == expected
+    assert find_exports([str(exports / "**" / "*.csv"), expected[1]]) == expected
+    assert find_exports([str(exports / "*.txt")]) == []
+
+
+def test_main(exports, config, tmp_path, capsys):
+    output_dir = tmp_path / "ledger"
+
+    assert (
+        main(
+            [str(exports), "-c", str(config), "-o", str(output_dir), "--workers", "1"]
+        )
+        == 0
+    )
+
+    ec_output = (output_dir / "Assets-DKB-EC.beancount").read_text(encoding="utf-8")
+
+    assert ec_output.index("2023-06-14") < ec_output.index("2023-06-15")
+    assert "Expenses:Supermarket" in ec_output
+    assert "2023-07-01 balance Assets:DKB:EC" in ec_output
+
+    credit_output = (output_dir / "Liabilities-DKB-Visa.beancount").read_text(
+        encoding="utf-8"
+    )
+
+    assert "REWE Filiale Muenchen" in credit_output
+
+    out = capsys.readouterr().out
+
+    assert "unknown.csv" in out
+    assert "not a known DKB export" in out
+    assert "2 of 3 files, 3 rows in" in out
+    assert "rows/s" in out
+    assert "files/s" in out
+
+
+def test_main_merges_overlapping_exports(exports, config, tmp_path, capsys):
+    export = exports / "2023" / "ec.csv"
+    (exports / "2023" / "ec-copy.csv").write_bytes(export.read_bytes())
+
+    output_dir = tmp_path / "ledger"
+
+    assert (
+        main([str(exports), "-c", str(config), "-o", str(output_dir), "-j", "1"]) == 0
+    )
+
+    ec_output = (output_dir / "Assets-DKB-EC.beancount").read_text(encoding="utf-8")
+
+    assert ec_output.count("EDEKA SAGT DANKE") == 1
+    assert ec_output.count("REWE SAGT DANKE") == 1
+    assert ec_output.count("balance Assets:DKB:EC") == 1
+    assert "3 of 4 files, 5 rows in" in capsys.readouterr().out
+
+
+def test_main_merges_overlapping_credit_exports(exports, config, tmp_path, capsys):
+    # ordered by receipt date, so the valuation dates are out of order
+    rows = [
+        credit_row("23.06.23", "LIDL", "-4,00\xa0€", valuation_day="24.06.23"),
+        credit_row("21.06.23", "EDEKA", "-1,00\xa0€", valuation_day="22.06.23"),
+        credit_row("21.06.23", "REWE", "-2,00\xa0€"),
+        credit_row("20.06.23", "ALDI", "-3,00\xa0€", valuation_day="22.06.23"),
+    ]
+
+    write_credit_export(exports / "credit.csv", rows[1:])
+    write_credit_export(exports / "credit-2.csv", rows)
+
+    output_dir = tmp_path / "ledger"
+
+    assert (
+        main([str(exports), "-c", str(config), "-o", str(output_dir), "-j", "1"]) == 0
+    )
+
+    credit_output = (output_dir / "Liabilities-DKB-Visa.beancount").read_text(
+        encoding="utf-8"
+    )
+
+    for description in ("LIDL", "EDEKA", "REWE", "ALDI"):
+        assert credit_output.count(f'"{description}"') == 1
+
+    assert credit_output.count("balance Liabilities:DKB:Visa") == 1
+    assert "3 of 4 files, 9 rows in" in capsys.readouterr().out
+
+
+def test_main_with_cache_dir(exports, config, tmp_path, capsys):
+    arguments = [
+        str(exports),
+        "-c",
+        str(config),
+        "-o",
+        str(tmp_path / "ledger"),
+        "-j",
+        "1",
+        "--cache-dir",
+        str(tmp_path / "cache"),
+    ]
+
+    assert main(arguments) == 0
+    assert len(list((tmp_path / "cache").glob("*/*.pickle.z"))) == 2
+
+    first_output = capsys.readouterr().out
+
+    assert main(arguments) == 0
+    assert "2 of 3 files, 3 rows in" in capsys.readouterr().out
+    assert "2 of 3 files, 3 rows in" in first_output
+
+
+def test_main_reports_errors(exports, config, tmp_path, capsys):
+    (exports / "credit.csv").write_text(
+        f'"Karte";"Visa Kreditkarte";"{CARD_NUMBER}"\n""\n{CREDIT_HEADER.value}\n'
+        '"15.01.23";"15.01.23";"Gebucht";"REWE";"Im Geschäft";"kaputt";""\n',
+        encoding="utf-8-sig",
+    )
+
+    output_dir = tmp_path / "ledger"
+
+    assert (
+        main([str(exports), "-c", str(config), "-o", str(output_dir), "-j", "1"]) == 1
+    )
+    assert not (output_dir / "Liabilities-DKB-Visa.beancount").exists()
+    assert "error: " in capsys.readouterr().out
+
+
+def test_main_invalid_config(exports, tmp_path, capsys):
+    config = tmp_path / "accounts.json"
+    config.write_text("not json")
+
+    with pytest.raises(SystemExit) as exc_info:
+        main([str(exports), "-c", str(config), "-o", str(tmp_path)])
+
+    assert exc_info.value.code == 2
+    assert "can't load" in capsys.readouterr().err
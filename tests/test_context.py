@@ -0,0 +1,111 @@
+import datetime
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from beancount.core.data import Balance, Transaction
+from conftest import CARD_NUMBER, IBAN, ec_row, write_ec_export
+
+from beancount_dkb import CreditImporter, ECImporter
+
+PAYEES = ["EDEKA", "REWE", "LIDL", "ALDI"]
+
+
+def _write(tmp_file, day, rows):
+    return write_ec_export(
+        tmp_file,
+        [
+            ec_row(
+                f"{day:02}.06.23",
+                PAYEES[row % len(PAYEES)],
+                f"-{row},00",
+                description="EINKAUF",
+            )
+            for row in range(1, rows + 1)
+        ],
+        balance=f"{day},00 EUR",
+        balance_date=f"{day:02}.06.2023",
+    )
+
+
+def _summary(entries):
+    return [
+        (
+            type(entry).__name__,
+            entry.date,
+            entry.postings[0].units if isinstance(entry, Transaction) else entry.amount,
+            entry.postings[-1].account if isinstance(entry, Transaction) else None,
+        )
+        for entry in entries
+    ]
+
+
+def test_share_importer_between_threads(tmp_path):
+    paths = [_write(tmp_path / f"{day}.csv", day, day * 10) for day in range(1, 17)]
+
+    def create_importer():
+        return ECImporter(
+            IBAN,
+            "Assets:DKB:EC",
+            payee_patterns=[
+                ("EDEKA", "Expenses:Supermarket"),
+                ("^RE", "Expenses:Food"),
+            ],
+            description_patterns=[("ZZZ", "Expenses:Never")],
+            matcher_cache_size=4,
+            cache_size=0,
+        )
+
+    expected = {path: _summary(create_importer().extract(path)) for path in paths}
+
+    importer = create_importer()
+    barrier = threading.Barrier(8)
+
+    def extract(path):
+        barrier.wait()
+        entries = importer.extract(path)
+
+        # the importer remembers the metadata of the file each thread read last
+        return entries, importer._balance_date, importer.date(path)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(extract, paths * 2))
+
+    for path, (entries, balance_date, date) in zip(paths * 2, results):
+        day = int(path.stem)
+
+        assert _summary(entries) == expected[path]
+        assert isinstance(entries[-1], Balance)
+        assert balance_date == datetime.date(2023, 6, day + 1)
+        assert date is None
+
+
+def test_interleaved_iter_extract(tmp_path):
+    first = _write(tmp_path / "1.csv", 1, 3)
+    second = _write(tmp_path / "2.csv", 2, 3)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    first_entries = importer.iter_extract(first)
+    second_entries = importer.iter_extract(second)
+
+    interleaved = [
+        entry for pair in zip(first_entries, second_entries) for entry in pair
+    ]
+
+    assert _summary(interleaved[0::2]) == _summary(importer.extract(first))
+    assert _summary(interleaved[1::2]) == _summary(importer.extract(second))
+
+
+def test_pickle_importer(tmp_path):
+    path = _write(tmp_path / "1.csv", 1, 3)
+
+    importer = CreditImporter(CARD_NUMBER, "Assets:DKB:Credit")
+    ec_importer = ECImporter(IBAN, "Assets:DKB:EC", matcher_cache_size=4)
+    ec_importer.extract(path)
+
+    copy = pickle.loads(pickle.dumps(ec_importer))
+
+    assert copy._balance_date is None
+    assert _summary(copy.extract(path)) == _summary(ec_importer.extract(path))
+    assert pickle.loads(pickle.dumps(importer)).card_number == CARD_NUMBER
@@ -169,6 +169,17 @@ def test_extract_transactions(tmp_file_single_transaction):
     assert directives[0].postings[0].units.number == Decimal("-10.80")
 
 
+def test_iter_extract_yields_closing_balance_last(tmp_file_single_transaction):
+    importer = CreditImporter(CARD_NUMBER, "Assets:DKB:Credit")
+
+    directives = list(importer.iter_extract(tmp_file_single_transaction))
+
+    assert len(directives) == 2
+    assert directives[0].date == datetime.date(2023, 1, 15)
+    assert isinstance(directives[1], Balance)
+    assert directives[1].amount == Amount(Decimal("5000.01"), currency="EUR")
+
+
 def test_credit_card_settlements_are_imported_by_default(tmp_path, header):
     tmp_file = tmp_path / f"{CARD_NUMBER}.csv"
     tmp_file.write_text(
@@ -0,0 +1,162 @@
+import datetime
+from decimal import Decimal
+from textwrap import dedent
+
+import pytest
+from beancount.core import data
+from beancount.core.amount import Amount
+
+from beancount_dkb import ECImporter
+from beancount_dkb.dedup import mark_duplicates
+from beancount_dkb.extractors.ec import V2Extractor
+
+IBAN = "DE99999999999999999999"
+
+ACCOUNT = "Assets:DKB:EC"
+
+# the ";" separated variant
+HEADER = V2Extractor(IBAN)._get_possible_headers()[1]
+
+
+def _transaction(date, number, account=ACCOUNT):
+    return data.Transaction(
+        data.new_metadata("ledger.beancount", 0),
+        date,
+        "*",
+        None,
+        "",
+        data.EMPTY_SET,
+        data.EMPTY_SET,
+        [
+            data.Posting(
+                account, Amount(Decimal(number), "EUR"), None, None, None, None
+            ),
+            data.Posting("Expenses:Misc", None, None, None, None, None),
+        ],
+    )
+
+
+def _balance(date, number, account=ACCOUNT):
+    return data.Balance(
+        data.new_metadata("ledger.beancount", 0),
+        date,
+        account,
+        Amount(Decimal(number), "EUR"),
+        None,
+        None,
+    )
+
+
+def _is_duplicate(entry):
+    return "__duplicate__" in entry.meta
+
+
+@pytest.mark.parametrize(
+    "days,window_days,duplicate",
+    [
+        (0, 2, True),
+        (2, 2, True),
+        (-2, 2, True),
+        (3, 2, False),
+        (3, 3, True),
+        (1, 0, False),
+    ],
+)
+def test_window(days, window_days, duplicate):
+    existing = _transaction(datetime.date(2023, 6, 15), "-8.67")
+    entry = _transaction(
+        datetime.date(2023, 6, 15) + datetime.timedelta(days=days), "-8.67"
+    )
+
+    mark_duplicates([entry], [existing], ACCOUNT, window_days)
+
+    assert _is_duplicate(entry) is duplicate
+
+    if duplicate:
+        assert entry.meta["__duplicate__"] is existing
+
+
+def test_amount_and_account_must_match():
+    date = datetime.date(2023, 6, 15)
+    existing = [
+        _transaction(date, "-8.68"),
+        _transaction(date, "-8.67", account="Assets:Other"),
+    ]
+    entry = _transaction(date, "-8.67")
+
+    mark_duplicates([entry], existing, ACCOUNT)
+
+    assert not _is_duplicate(entry)
+
+
+def test_existing_entries_are_matched_once():
+    date = datetime.date(2023, 6, 15)
+    entries = [_transaction(date, "-8.67"), _transaction(date, "-8.67")]
+
+    mark_duplicates(entries, [_transaction(date, "-8.67")], ACCOUNT)
+
+    assert [_is_duplicate(entry) for entry in entries] == [True, False]
+
+
+def test_closest_date_is_preferred():
+    date = datetime.date(2023, 6, 15)
+    before = _transaction(date - datetime.timedelta(days=1), "-8.67")
+    same_day = _transaction(date, "-8.67")
+    entry = _transaction(date, "-8.67")
+
+    mark_duplicates([entry], [before, same_day], ACCOUNT)
+
+    assert entry.meta["__duplicate__"] is same_day
+
+
+def test_same_day_matches_come_first():
+    existing = _transaction(datetime.date(2023, 1, 2), "-10.00")
+    entries = [
+        _transaction(datetime.date(2023, 1, 1), "-10.00"),
+        _transaction(datetime.date(2023, 1, 2), "-10.00"),
+    ]
+
+    mark_duplicates(entries, [existing], ACCOUNT)
+
+    assert [_is_duplicate(entry) for entry in entries] == [False, True]
+    assert entries[1].meta["__duplicate__"] is existing
+
+
+def test_balances():
+    date = datetime.date(2023, 6, 30)
+    entries = [
+        _balance(date, "5001.01"),
+        _balance(date + datetime.timedelta(days=1), "5001.01"),
+        _balance(date, "5001.02"),
+    ]
+
+    mark_duplicates(entries, [_balance(date, "5001.01")], ACCOUNT)
+
+    assert [_is_duplicate(entry) for entry in entries] == [True, False, False]
+
+
+def test_importer_deduplicate(tmp_path):
+    tmp_file = tmp_path / "ec.csv"
+    tmp_file.write_text(
+        dedent(
+            f"""
+            "Girokonto";"{IBAN}"
+            ""
+            "Kontostand vom 30.06.2023:";"5.001,01 EUR"
+            ""
+            {HEADER.value}
+            "15.06.23";"15.06.23";"Gebucht";"ISSUER";"EDEKA";"EDEKA SAGT DANKE";"Ausgang";"";"-8,67";"";"";""
+            "14.06.23";"14.06.23";"Gebucht";"ISSUER";"REWE";"REWE SAGT DANKE";"Ausgang";"";"-2,00";"";"";""
+            """  # NOQA
+        ).lstrip(),
+        encoding="utf-8-sig",
+    )
+
+    importer = ECImporter(IBAN, ACCOUNT, duplicate_window_days=1)
+
+    existing = [_transaction(datetime.date(2023, 6, 16), "-8.67")]
+    entries = importer.extract(tmp_file, existing)
+
+    importer.deduplicate(entries, existing)
+
+    assert [_is_duplicate(entry) for entry in entries] == [True, False, False]
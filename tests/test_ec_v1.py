@@ -308,6 +308,32 @@ def test_file_date_is_set_correctly(tmp_file_single_transaction, header):
     assert importer.date(tmp_file_single_transaction) == datetime.date(2018, 1, 31)
 
 
+def test_file_date_does_not_parse_transactions(tmp_file, header):
+    tmp_file.write_text(
+        _format(
+            """
+            "Kontonummer:";"{iban} / Girokonto";
+
+            "Von:";"01.01.2018";
+            "Bis:";"31.01.2018";
+            "Kontostand vom 31.01.2018:";"5.000,01 EUR";
+
+            {header}
+            "not a date";"16.01.2018";"Lastschrift";"REWE Filialen Voll";"REWE SAGT DANKE.";"DE00000000000000000000";"AAAAAAAA";"-15,37";"";"";"";
+            """,  # NOQA
+            dict(iban=IBAN, header=header),
+        ),
+        encoding=ENCODING,
+    )
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    assert importer.date(tmp_file) == datetime.date(2018, 1, 31)
+
+    with pytest.raises(ValueError):
+        importer.extract(tmp_file)
+
+
 def test_emits_closing_balance_directive(tmp_file_single_transaction, header):
     importer = ECImporter(IBAN, "Assets:DKB:EC")
 
@@ -411,6 +437,7 @@ def test_extract_with_payee_and_description_patterns(
         "Assets:DKB:EC",
         payee_patterns=[("REWE Filialen", "Expenses:Supermarket:REWE")],
         description_patterns=[("SAGT DANKE", "Expenses:Supermarket:REWE")],
+        matcher_conflicts="warn",
     )
 
     with pytest.warns(UserWarning) as user_warnings:
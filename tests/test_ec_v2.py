@@ -1,4 +1,5 @@
 import datetime
+import warnings
 from decimal import Decimal
 from textwrap import dedent
 
@@ -7,6 +8,7 @@ from babel.numbers import NumberFormatError
 from beancount.core.data import Amount, Balance
 
 from beancount_dkb import ECImporter
+from beancount_dkb.conflicts import MatcherRule
 from beancount_dkb.ec import V2Extractor
 
 FORMATTED_IBAN = "DE99 9999 9999 9999 9999 99"
@@ -481,6 +483,7 @@ def test_iban_matcher_takes_precedence_over_other_matchers(
         payee_patterns=[("EDEKA", "Expenses:Supermarket:EDEKA")],
         description_patterns=[("SAGT DANKE", "Expenses:Supermarket:EDEKA")],
         iban_matcher=[("DE00000000000000000000", "Assets:DKB:HYSA")],
+        matcher_conflicts="warn",
     )
 
     with pytest.warns(UserWarning) as user_warnings:
@@ -504,6 +507,7 @@ def test_extract_with_payee_and_description_patterns(tmp_file_single_transaction
         "Assets:DKB:EC",
         payee_patterns=[("EDEKA", "Expenses:Supermarket:EDEKA")],
         description_patterns=[("SAGT DANKE", "Expenses:Supermarket:EDEKA")],
+        matcher_conflicts="warn",
     )
 
     with pytest.warns(UserWarning) as user_warnings:
@@ -523,3 +527,115 @@ def test_extract_with_payee_and_description_patterns(tmp_file_single_transaction
         "Line 6 matches both payee_patterns and description_patterns. "
         "Picking payee_pattern."
     )
+
+
+def test_report_matcher_conflicts(tmp_file_single_transaction):
+    importer = ECImporter(
+        IBAN,
+        "Assets:DKB:EC",
+        payee_patterns=[("EDEKA", "Expenses:Supermarket:EDEKA")],
+        description_patterns=[("SAGT DANKE", "Expenses:Supermarket:EDEKA")],
+        iban_matcher=[("DE00000000000000000000", "Assets:DKB:HYSA")],
+        matcher_conflicts="report",
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        directives = importer.extract(tmp_file_single_transaction)
+
+    assert directives[0].postings[1].account == "Assets:DKB:HYSA"
+
+    iban_rule = MatcherRule("iban_matcher", "DE00000000000000000000")
+
+    assert [
+        (rules, conflict.count, conflict.samples)
+        for rules, conflict in importer.conflicts.items()
+    ] == [
+        (
+            (iban_rule, MatcherRule("payee_patterns", "EDEKA")),
+            1,
+            [(str(tmp_file_single_transaction), 6)],
+        ),
+        (
+            (iban_rule, MatcherRule("description_patterns", "SAGT DANKE")),
+            1,
+            [(str(tmp_file_single_transaction), 6)],
+        ),
+    ]
+    assert importer.conflicts.to_dict()[0] == {
+        "selected": {"matcher": "iban_matcher", "label": "DE00000000000000000000"},
+        "other": {"matcher": "payee_patterns", "label": "EDEKA"},
+        "count": 1,
+        "samples": [{"filepath": str(tmp_file_single_transaction), "line": 6}],
+    }
+
+
+def test_ignore_matcher_conflicts(tmp_file_single_transaction):
+    importer = ECImporter(
+        IBAN,
+        "Assets:DKB:EC",
+        payee_patterns=[("EDEKA", "Expenses:Supermarket:EDEKA")],
+        description_patterns=[("SAGT DANKE", "Expenses:Supermarket:Other")],
+        matcher_conflicts="ignore",
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        directives = importer.extract(tmp_file_single_transaction)
+
+    assert directives[0].postings[1].account == "Expenses:Supermarket:EDEKA"
+    assert len(importer.conflicts) == 0
+
+
+def test_matcher_priority(tmp_file_single_transaction, recwarn):
+    importer = ECImporter(
+        IBAN,
+        "Assets:DKB:EC",
+        payee_patterns=[("EDEKA", "Expenses:Supermarket:EDEKA")],
+        description_patterns=[("SAGT DANKE", "Expenses:Supermarket:Other")],
+        iban_matcher=[("DE00000000000000000000", "Assets:DKB:HYSA")],
+        matcher_priority=["description_patterns", "iban_matcher"],
+    )
+
+    directives = importer.extract(tmp_file_single_transaction)
+
+    assert directives[0].postings[1].account == "Expenses:Supermarket:Other"
+    assert len(recwarn) == 0
+
+
+@pytest.mark.parametrize(
+    "matcher_priority",
+    [["iban_matcher", "iban_matcher"], ["payee_matcher"]],
+)
+def test_invalid_matcher_priority(matcher_priority):
+    with pytest.raises(ValueError):
+        ECImporter(IBAN, "Assets:DKB:EC", matcher_priority=matcher_priority)
+
+
+def test_invalid_matcher_conflicts_mode():
+    with pytest.raises(ValueError):
+        ECImporter(IBAN, "Assets:DKB:EC", matcher_conflicts="raise")
+
+
+def test_iter_extract_yields_same_directives(tmp_file_multiple_transaction):
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    directives = importer.iter_extract(tmp_file_multiple_transaction)
+
+    assert not isinstance(directives, list)
+    assert list(directives) == importer.extract(tmp_file_multiple_transaction)
+
+
+def test_identify_only_considers_prefix(tmp_file_single_transaction):
+    importer = ECImporter(IBAN, "Assets:DKB:EC", identify_prefix_size=64)
+
+    assert not importer.identify(tmp_file_single_transaction)
+
+
+def test_identify_rejects_binary_files(tmp_path):
+    tmp_file = tmp_path / "archive.bin"
+    tmp_file.write_bytes(bytes(range(256)) * 4096)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    assert not importer.identify(tmp_file)
@@ -0,0 +1,54 @@
+import csv
+
+from beancount_dkb.extractors.export import (
+    ParsedExport,
+    iter_csv_rows,
+    read_prefix_lines,
+)
+from beancount_dkb.helpers import Header
+
+
+def test_read_prefix_lines_drops_incomplete_last_line(tmp_path):
+    tmp_file = tmp_path / "export.csv"
+    tmp_file.write_bytes(b'"a";"b"\r\n"c";"d"\n"e";"f"')
+
+    assert read_prefix_lines(tmp_file, "utf-8", 1024) == [
+        '"a";"b"',
+        '"c";"d"',
+        '"e";"f"',
+    ]
+    assert read_prefix_lines(tmp_file, "utf-8", 12) == ['"a";"b"']
+
+
+def test_read_prefix_lines_handles_cut_multibyte_characters(tmp_path):
+    tmp_file = tmp_path / "export.csv"
+    tmp_file.write_text('"Betrag (€)"\n"€"\n', encoding="utf-8-sig")
+
+    assert read_prefix_lines(tmp_file, "utf-8-sig", 19) == ['"Betrag (€)"']
+
+
+def test_iter_csv_rows_skips_header_and_empty_rows():
+    reader = csv.reader(['"a";"b";"c"', '"1";"2";"3"', "", '"4";"5"'], delimiter=";")
+
+    assert list(iter_csv_rows(reader, 3)) == [["1", "2", "3"], ["4", "5", None]]
+
+
+def test_parsed_export_locates_header_by_byte_offset(tmp_path):
+    header = Header('"Datum";"Betrag (€)"', ";")
+    content = '"Konto";"Müller"\r\n""\r\n' + header.value + '\r\n"1";"2 €"\r\n"3";"4"\n'
+
+    tmp_file = tmp_path / "export.csv"
+    tmp_file.write_text(content, encoding="utf-8-sig", newline="")
+
+    raw = tmp_file.read_bytes()
+    export = ParsedExport(tmp_file, "utf-8-sig", [header])
+
+    assert export.header == header
+    assert export.metadata_lines == ['"Konto";"Müller"', '""']
+    assert export.header_offset == raw.index(header.value.encode("utf-8"))
+    assert raw[export.body_offset :].startswith(b'"1";"2')
+    assert list(export.iter_transaction_lines()) == [
+        header.value,
+        '"1";"2 €"',
+        '"3";"4"',
+    ]
@@ -1,7 +1,17 @@
+import re
+from datetime import datetime
+
 import pytest
 from beancount.core.number import Decimal
 
-from beancount_dkb.helpers import IBANMatcher, fmt_number_de
+from beancount_dkb.helpers import (
+    AccountMatcher,
+    IBANMatcher,
+    _fmt_number_babel,
+    fmt_number_de,
+    fmt_number_en,
+    parse_date,
+)
 
 
 def test_fmt_number_de():
@@ -22,3 +32,212 @@ def test_iban_matcher_ignores_empty_entries():
     assert user_warnings[0].message.args[0] == (
         "Ignoring empty iban_matcher entry for account Assets:DKB:Empty."
     )
+
+
+NUMBER_CORPUS = [
+    "0",
+    "-0",
+    "-0,00",
+    "1",
+    "1,5",
+    "1,50",
+    "15,0",
+    "150",
+    "1234,0",
+    "1.234",
+    "1.234,56",
+    "-1.234,56",
+    "1.000,0",
+    "-1.450",
+    "12.345.678,90",
+    "5.000,01",
+    "-8,67",
+    "136,52",
+    "5000.01",
+    "1111.11",
+    "1,234.56",
+    "12.34",
+    "1.2.3",
+    "1,",
+    ",5",
+    "+5,00",
+    " 5,00",
+    "1.000,001",
+    "5000,001",
+    "1,100",
+    "1.100",
+    "12345678901234567890123456789,12",
+    "abc",
+    "",
+    "-",
+    "1e3",
+]
+
+
+def _format_number(formatter, value):
+    try:
+        return formatter(value)
+    except (ArithmeticError, ValueError) as e:
+        return type(e), str(e)
+
+
+@pytest.mark.parametrize("value", NUMBER_CORPUS)
+@pytest.mark.parametrize(
+    "formatter,locale",
+    [(fmt_number_de, "de_DE"), (fmt_number_en, "en_US")],
+)
+def test_fmt_number_matches_babel(formatter, locale, value):
+    expected = _format_number(lambda value: _fmt_number_babel(value, locale), value)
+    actual = _format_number(formatter, value)
+
+    assert repr(actual) == repr(expected)
+
+
+@pytest.mark.parametrize(
+    "value,format",
+    [
+        ("15.06.23", "%d.%m.%y"),
+        ("01.01.69", "%d.%m.%y"),
+        ("31.12.68", "%d.%m.%y"),
+        ("16.01.2018", "%d.%m.%Y"),
+        ("29.02.2024", "%d.%m.%Y"),
+    ],
+)
+def test_parse_date_matches_strptime(value, format):
+    assert parse_date(value, format) == datetime.strptime(value, format).date()
+    assert parse_date(value, format) == datetime.strptime(value, format).date()
+
+
+def test_parse_date_raises_for_invalid_dates():
+    with pytest.raises(ValueError):
+        parse_date("30.02.2024", "%d.%m.%Y")
+
+
+ACCOUNT_MATCHER_PATTERNS = [
+    ("B", "Expenses:B"),
+    ("A", "Expenses:A"),
+    ("SAGT DANKE", "Expenses:Literal"),
+    (r"(R)(E)WE", "Expenses:Groups"),
+    ("^EDE", "Expenses:Anchored"),
+    ("KA$", "Expenses:End"),
+    (r"\bNET", "Expenses:WordBoundary"),
+    (r"N*TFL*X", "Expenses:Netflix"),
+    (r"(?i)miete", "Expenses:Rent"),
+    (r"(L)\1", "Expenses:Backreference"),
+    ("x?", "Expenses:Empty"),
+]
+
+ACCOUNT_MATCHER_STRINGS = [
+    "AB",
+    "REWE SAGT DANKE",
+    "EDEKA",
+    "xEDEKA",
+    "NETFLIX",
+    "THE NET",
+    "MIETE",
+    "HALLO",
+    "",
+    "QQQ",
+]
+
+
+def _reference_account_for(patterns, string):
+    for pattern, account in patterns:
+        if re.search(pattern, string):
+            return account
+
+
+@pytest.mark.parametrize("string", ACCOUNT_MATCHER_STRINGS)
+@pytest.mark.parametrize(
+    "patterns",
+    [
+        ACCOUNT_MATCHER_PATTERNS,
+        # without the patterns that can't be merged into a combined pattern
+        [
+            (pattern, account)
+            for pattern, account in ACCOUNT_MATCHER_PATTERNS
+            if "(?i)" not in pattern and "\\1" not in pattern
+        ],
+        # without the pattern matching everything
+        ACCOUNT_MATCHER_PATTERNS[:-1],
+        list(reversed(ACCOUNT_MATCHER_PATTERNS)),
+    ],
+)
+def test_account_matcher_picks_first_matching_pattern(patterns, string):
+    matcher = AccountMatcher(patterns)
+
+    assert matcher.account_for(string) == _reference_account_for(patterns, string)
+
+
+def test_account_matcher_recompiles_after_add():
+    matcher = AccountMatcher([("REWE", "Expenses:REWE")])
+
+    assert matcher.account_for("EDEKA") is None
+
+    matcher.add("EDEKA", "Expenses:EDEKA")
+
+    assert matcher.account_for("EDEKA") == "Expenses:EDEKA"
+
+
+def test_account_matcher_without_patterns():
+    assert AccountMatcher().account_for("EDEKA") is None
+
+
+def test_iban_matcher_uses_first_account_for_an_iban():
+    matcher = IBANMatcher(
+        [
+            ("DE00 0000 0000 0000 0000 00", "Assets:DKB:First"),
+            ("de00000000000000000000", "Assets:DKB:Second"),
+            ("DE11111111111111111111", "Assets:DKB:Other"),
+        ]
+    )
+
+    assert matcher.account_for(" de00 0000 0000 0000 0000 00") == "Assets:DKB:First"
+    assert matcher.account_for("DE11111111111111111111") == "Assets:DKB:Other"
+    assert matcher.account_for("DE22222222222222222222") is None
+    assert len(matcher.entries) == 3
+
+
+def test_account_matcher_cache_counts_hits_and_misses():
+    matcher = AccountMatcher([("REWE", "Expenses:REWE")], cache_size=2)
+
+    assert matcher.account_for("REWE SAGT DANKE") == "Expenses:REWE"
+    assert matcher.account_for("REWE SAGT DANKE") == "Expenses:REWE"
+    assert matcher.account_for("EDEKA") is None
+    assert matcher.account_for("EDEKA") is None
+    assert matcher.account_for("ALDI") is None
+
+    assert matcher.cache_info() == (2, 3, 2, 2)
+
+
+def test_account_matcher_cache_is_cleared_by_add():
+    matcher = AccountMatcher([("REWE", "Expenses:REWE")], cache_size=16)
+
+    assert matcher.account_for("EDEKA") is None
+
+    matcher.add("EDEKA", "Expenses:EDEKA")
+
+    assert matcher.account_for("EDEKA") == "Expenses:EDEKA"
+    assert matcher.cache_info().currsize == 1
+
+
+def test_iban_matcher_cache():
+    matcher = IBANMatcher(
+        [("DE00000000000000000000", "Assets:DKB:HYSA")], cache_size=16
+    )
+
+    assert matcher.account_for("DE00 0000 0000 0000 0000 00") == "Assets:DKB:HYSA"
+    assert matcher.account_for("DE00 0000 0000 0000 0000 00") == "Assets:DKB:HYSA"
+    assert matcher.account_for(None) is None
+
+    assert matcher.cache_info() == (1, 2, 16, 2)
+
+    matcher.add("DE11111111111111111111", "Assets:DKB:Other")
+
+    assert matcher.cache_info().currsize == 0
+    assert matcher.account_for("DE11111111111111111111") == "Assets:DKB:Other"
+
+
+def test_matchers_without_cache():
+    assert AccountMatcher().cache_info() is None
+    assert IBANMatcher().cache_info() is None
@@ -0,0 +1,85 @@
+import subprocess
+import sys
+
+import pytest
+
+# Importing an importer should take next to no time on top of beancount and
+# beangulp, which it can't do without. The budget is generous, so that slow
+# machines don't fail the test, but it catches heavy dependencies (or opt-in
+# features) being imported eagerly again.
+IMPORT_TIME_BUDGET_US = 75_000
+
+# everything the importers need from other packages, imported before timing
+THIRD_PARTY_IMPORTS = (
+    "import beancount.core.amount, beancount.core.data, beancount.core.flags, "
+    "beancount.core.number, beangulp.importer"
+)
+
+
+def _run(code, *options):
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+
+def _imported_modules(code):
+    result = _run(f"import sys\n{code}\nprint('\\n'.join(sys.modules))")
+
+    return set(result.stdout.split())
+
+
+def test_import_time_budget():
+    result = _run(
+        f"{THIRD_PARTY_IMPORTS}\n"
+        "from time import perf_counter\n"
+        "start = perf_counter()\n"
+        "from beancount_dkb import ECImporter\n"
+        "print(round((perf_counter() - start) * 1e6))"
+    )
+
+    assert int(result.stdout) < IMPORT_TIME_BUDGET_US
+
+
+def test_package_import_is_lazy():
+    modules = _imported_modules("import beancount_dkb")
+
+    assert "beangulp" not in modules
+    assert "beancount" not in modules
+    assert "beancount_dkb.ec" not in modules
+    assert "beancount_dkb.credit" not in modules
+
+
+@pytest.mark.parametrize(
+    "name,module,other_module",
+    [
+        ("ECImporter", "beancount_dkb.ec", "beancount_dkb.credit"),
+        ("CreditImporter", "beancount_dkb.credit", "beancount_dkb.ec"),
+    ],
+)
+def test_importers_are_imported_on_first_use(name, module, other_module):
+    modules = _imported_modules(f"from beancount_dkb import {name}")
+
+    assert module in modules
+    assert other_module not in modules
+    assert "babel" not in modules
+    assert "importlib.metadata" not in modules
+    assert f"beancount_dkb.extractors.{module.rsplit('.', 1)[1]}" not in modules
+
+    # opt-in features are only imported once they're used
+    for feature in ("registry", "stats", "watermark"):
+        assert f"beancount_dkb.{feature}" not in modules
+
+
+def test_extractors_are_still_available():
+    from beancount_dkb.credit import V1Extractor as CreditV1Extractor
+    from beancount_dkb.ec import V2Extractor
+    from beancount_dkb.extractors import credit, ec
+
+    assert V2Extractor is ec.V2Extractor
+    assert CreditV1Extractor is credit.V1Extractor
+
+    with pytest.raises(ImportError):
+        from beancount_dkb.ec import V3Extractor  # NOQA
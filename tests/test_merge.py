@@ -0,0 +1,234 @@
+import datetime
+from decimal import Decimal
+from textwrap import dedent
+
+import pytest
+from beancount.core.data import Amount, Balance, Transaction
+from conftest import (
+    CARD_NUMBER,
+    IBAN,
+    credit_row,
+    ec_row,
+    write_credit_export,
+    write_ec_export,
+)
+
+from beancount_dkb import CreditImporter, ECImporter
+from beancount_dkb.extractors.ec import V1Extractor
+from beancount_dkb.merge import merge_exports
+
+V1_HEADER = V1Extractor(IBAN)._get_possible_headers()[0]
+
+
+def _v2_row(day, payee, amount):
+    return ec_row(day, payee, amount, description=payee)
+
+
+def _write_v2(tmp_file, balance_date, balance, rows):
+    return write_ec_export(
+        tmp_file, rows, balance=f"{balance} EUR", balance_date=balance_date
+    )
+
+
+def _summary(directives):
+    return [
+        (
+            type(directive).__name__,
+            directive.date,
+            directive.payee if isinstance(directive, Transaction) else None,
+        )
+        for directive in directives
+    ]
+
+
+def test_merge_overlapping_exports(tmp_path):
+    archive = _write_v2(
+        tmp_path / "archive.csv",
+        "31.05.2023",
+        "100,00",
+        [
+            _v2_row("20.05.23", "REWE", "-1,00"),
+            _v2_row("20.05.23", "REWE", "-1,00"),
+            _v2_row("10.05.23", "EDEKA", "-2,00"),
+            _v2_row("01.05.23", "LIDL", "-3,00"),
+        ],
+    )
+    weekly = _write_v2(
+        tmp_path / "weekly.csv",
+        "30.06.2023",
+        "200,00",
+        [
+            _v2_row("15.06.23", "ALDI", "-4,00"),
+            _v2_row("20.05.23", "REWE", "-1,00"),
+            _v2_row("20.05.23", "REWE", "-1,00"),
+            _v2_row("20.05.23", "REWE", "-1,00"),
+            _v2_row("10.05.23", "EDEKA", "-2,00"),
+        ],
+    )
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    directives = list(merge_exports(importer, [weekly, archive]))
+
+    assert _summary(directives) == [
+        ("Transaction", datetime.date(2023, 6, 15), "ALDI"),
+        ("Transaction", datetime.date(2023, 5, 20), "REWE"),
+        ("Transaction", datetime.date(2023, 5, 20), "REWE"),
+        ("Transaction", datetime.date(2023, 5, 20), "REWE"),
+        ("Transaction", datetime.date(2023, 5, 10), "EDEKA"),
+        ("Transaction", datetime.date(2023, 5, 1), "LIDL"),
+        ("Balance", datetime.date(2023, 7, 1), None),
+    ]
+    assert directives[-1].amount == Amount(Decimal("200.00"), "EUR")
+
+
+def test_merge_different_formats(tmp_path):
+    legacy = tmp_path / "legacy.csv"
+    legacy.write_text(
+        dedent(
+            f"""
+            "Kontonummer:";"{IBAN} / Girokonto";
+
+            "Von:";"01.01.2023";
+            "Bis:";"31.01.2023";
+            "Kontostand vom 31.01.2023:";"50,00 EUR";
+
+            {V1_HEADER.value}
+            "16.01.2023";"16.01.2023";"Lastschrift";"REWE";"REWE SAGT DANKE";"";"";"-15,37";"";"";"";
+            """  # NOQA
+        ).lstrip(),
+        encoding="ISO-8859-1",
+    )
+    current = _write_v2(
+        tmp_path / "current.csv",
+        "30.06.2023",
+        "200,00",
+        [_v2_row("15.06.23", "ALDI", "-4,00")],
+    )
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    directives = list(merge_exports(importer, [legacy, current]))
+
+    assert [type(directive) for directive in directives] == [
+        Transaction,
+        Transaction,
+        Balance,
+    ]
+    assert directives[0].meta["filename"] == current
+    assert directives[1].meta["filename"] == legacy
+    assert directives[2].amount == Amount(Decimal("200.00"), "EUR")
+
+
+def _write_v1(tmp_file, date_from, rows):
+    tmp_file.write_text(
+        dedent(
+            f"""
+            "Kontonummer:";"{IBAN} / Girokonto";
+
+            "Von:";"{date_from}";
+            "Bis:";"31.01.2023";
+            "Kontostand vom 31.01.2023:";"50,00 EUR";
+
+            {V1_HEADER.value}
+            """
+        ).lstrip()
+        + "\n".join(rows)
+        + "\n",
+        encoding="ISO-8859-1",
+    )
+
+    return tmp_file
+
+
+def _v1_row(day, payee, amount):
+    return (
+        f'"{day}";"{day}";"Lastschrift";"{payee}";"{payee}";"";"";"{amount}";'
+        '"";"";"";'
+    )
+
+
+def _v1_tagessaldo(day, amount):
+    return f'"{day}";"";"";"";"Tagessaldo";"";"";"{amount}";'
+
+
+def test_merge_exports_with_tagessaldo(tmp_path):
+    # DKB lists the Tagessaldo row of a day below that day's transactions. Its
+    # balance is dated the day after, so it's out of order by directive date.
+    rows = [
+        _v1_row("20.01.2023", "REWE", "-1,00"),
+        _v1_row("20.01.2023", "EDEKA", "-2,00"),
+        _v1_tagessaldo("20.01.2023", "50,00"),
+        _v1_row("19.01.2023", "REWE", "-1,00"),
+        _v1_tagessaldo("19.01.2023", "53,00"),
+        _v1_row("18.01.2023", "LIDL", "-3,00"),
+        _v1_tagessaldo("18.01.2023", "54,00"),
+    ]
+    archive = _write_v1(tmp_path / "archive.csv", "01.01.2023", rows)
+    weekly = _write_v1(tmp_path / "weekly.csv", "19.01.2023", rows[:5])
+    copy = _write_v1(tmp_path / "copy.csv", "01.01.2023", rows)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC")
+
+    directives = list(merge_exports(importer, [weekly, archive, copy]))
+
+    assert _summary(directives) == [
+        ("Transaction", datetime.date(2023, 1, 20), "REWE"),
+        ("Transaction", datetime.date(2023, 1, 20), "EDEKA"),
+        ("Balance", datetime.date(2023, 1, 21), None),
+        ("Transaction", datetime.date(2023, 1, 19), "REWE"),
+        ("Balance", datetime.date(2023, 1, 20), None),
+        ("Transaction", datetime.date(2023, 1, 18), "LIDL"),
+        ("Balance", datetime.date(2023, 1, 19), None),
+        ("Balance", datetime.date(2023, 2, 1), None),
+    ]
+    assert _summary(directives) == _summary(importer.extract(archive))
+
+
+def _credit_row(receipt_day, valuation_day, description, amount):
+    return credit_row(
+        receipt_day, description, f"{amount}\xa0€", valuation_day=valuation_day
+    )
+
+
+def _credit_rows():
+    # the rows are ordered by receipt date, and valued on the day after, except
+    # for REWE
+    return [
+        _credit_row("23.06.23", "24.06.23", "LIDL", "-4,00"),
+        _credit_row("21.06.23", "22.06.23", "EDEKA", "-1,00"),
+        _credit_row("21.06.23", "21.06.23", "REWE", "-2,00"),
+        _credit_row("20.06.23", "22.06.23", "ALDI", "-3,00"),
+    ]
+
+
+def test_merge_credit_exports_out_of_order(tmp_path):
+    rows = _credit_rows()
+    first = write_credit_export(tmp_path / "first.csv", rows[1:])
+    second = write_credit_export(tmp_path / "second.csv", rows)
+
+    importer = CreditImporter(CARD_NUMBER, "Assets:DKB:Credit")
+
+    directives = list(merge_exports(importer, [first, second]))
+
+    assert sorted(
+        directive.narration
+        for directive in directives
+        if isinstance(directive, Transaction)
+    ) == ["ALDI", "EDEKA", "LIDL", "REWE"]
+    assert isinstance(directives[-1], Balance)
+
+
+def test_merge_exports_out_of_order_beyond_window(tmp_path):
+    rows = _credit_rows()
+    first = write_credit_export(tmp_path / "first.csv", rows[1:])
+    second = write_credit_export(tmp_path / "second.csv", rows)
+
+    importer = CreditImporter(CARD_NUMBER, "Assets:DKB:Credit")
+
+    with pytest.raises(ValueError, match="isn't ordered by date"):
+        list(merge_exports(importer, [first, second], window_days=0))
+
+
+def test_merge_nothing():
+    assert list(merge_exports(ECImporter(IBAN, "Assets:DKB:EC"), [])) == []
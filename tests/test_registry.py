@@ -0,0 +1,116 @@
+from textwrap import dedent
+
+import pytest
+from conftest import CARD_NUMBER, IBAN, OTHER_IBAN, write_ec_export
+
+from beancount_dkb import CreditImporter, ECImporter
+from beancount_dkb.registry import ImporterRegistry, first_line_key, read_first_line
+
+
+def _write(tmp_file, string, encoding="utf-8-sig"):
+    tmp_file.write_text(dedent(string).lstrip(), encoding=encoding)
+
+    return tmp_file
+
+
+@pytest.fixture
+def importers():
+    return [
+        ECImporter(OTHER_IBAN, "Assets:DKB:Other"),
+        ECImporter("DE99 9999 9999 9999 9999 99", "Assets:DKB:EC"),
+        CreditImporter("1234 5678 9012 5678", "Assets:DKB:Credit"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "line,key",
+    [
+        (f'"Kontonummer:";"{IBAN} / Girokonto";', f"iban:{IBAN}"),
+        (f'"Girokonto","{IBAN}"', f"iban:{IBAN}"),
+        (f'"Tagesgeld";"{IBAN}"', f"iban:{IBAN}"),
+        ('"Kreditkarte:";"1234********5678 Kreditkarte";', "card:12345678"),
+        ('"Kreditkarte:";"1234********5678";', "card:12345678"),
+        (f'"Karte","Visa Kreditkarte","{CARD_NUMBER}"', "card:12345678"),
+        ('"Datum","Betrag"', None),
+        ("", None),
+    ],
+)
+def test_first_line_key(line, key):
+    assert first_line_key(line) == key
+
+
+def test_importer_for_ec_export(tmp_path, importers):
+    tmp_file = write_ec_export(tmp_path / "export.csv", [])
+
+    registry = ImporterRegistry(importers)
+
+    assert registry.importer_for(tmp_file) is importers[1]
+    assert registry.identify(importers[1], tmp_file)
+    assert not registry.identify(importers[0], tmp_file)
+
+
+def test_importer_for_credit_export(tmp_path, importers):
+    tmp_file = _write(
+        tmp_path / "export.csv",
+        """
+        "Kreditkarte:";"1234********5678";
+
+        "Von:";"01.01.2018";
+        "Bis:";"31.01.2018";
+        "Saldo:";"5000.01 EUR";
+        "Datum:";"30.01.2018";
+        """,
+        encoding="ISO-8859-1",
+    )
+
+    registry = ImporterRegistry(importers)
+
+    assert registry.importer_for(tmp_file) is importers[2]
+
+
+def test_importer_for_unknown_file(tmp_path, importers):
+    tmp_file = _write(tmp_path / "export.csv", '"Datum","Betrag"\n')
+
+    assert ImporterRegistry(importers).importer_for(tmp_file) is None
+
+
+def test_register_ignores_duplicate_accounts(importers):
+    with pytest.warns(UserWarning):
+        registry = ImporterRegistry(
+            importers + [ECImporter(IBAN, "Assets:DKB:Duplicate")]
+        )
+
+    assert len(registry) == 3
+    assert list(registry) == importers
+
+
+def test_importers_identify_through_registry(tmp_path, monkeypatch):
+    ec_file = write_ec_export(tmp_path / "ec.csv", [])
+    unknown_file = _write(tmp_path / "unknown.csv", '"Datum","Betrag"\n')
+
+    registry = ImporterRegistry()
+    importers = [
+        ECImporter(OTHER_IBAN, "Assets:DKB:Other", registry=registry),
+        ECImporter(IBAN, "Assets:DKB:EC", registry=registry),
+        CreditImporter("1234 5678 9012 5678", "Assets:DKB:Credit", registry=registry),
+    ]
+
+    assert list(registry) == importers
+
+    first_lines_read = []
+
+    def _read_first_line(filepath):
+        first_lines_read.append(filepath)
+
+        return read_first_line(filepath)
+
+    monkeypatch.setattr("beancount_dkb.registry.read_first_line", _read_first_line)
+
+    # the way beangulp asks every importer about every file
+    identified = {
+        filepath: [importer for importer in importers if importer.identify(filepath)]
+        for filepath in (ec_file, unknown_file)
+    }
+
+    assert identified == {ec_file: [importers[1]], unknown_file: []}
+    assert first_lines_read == [ec_file, unknown_file]
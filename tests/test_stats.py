@@ -0,0 +1,120 @@
+import json
+import time
+
+import pytest
+from conftest import (
+    CARD_NUMBER,
+    IBAN,
+    credit_row,
+    ec_row,
+    write_credit_export,
+    write_ec_export,
+)
+
+from beancount_dkb import CreditImporter, ECImporter
+from beancount_dkb.stats import PHASES, ExtractionStats, FileStats
+
+
+@pytest.fixture
+def ec_file(tmp_path):
+    return write_ec_export(
+        tmp_path / "ec.csv",
+        [
+            ec_row("15.06.23", iban="DE00 0000 0000 0000 0000 00"),
+            ec_row("14.06.23", amount="-1,00", iban="DE00000000000000000000"),
+            ec_row("13.06.23", "REWE", "-2,00"),
+        ],
+    )
+
+
+@pytest.fixture
+def credit_file(tmp_path):
+    return write_credit_export(
+        tmp_path / "credit.csv",
+        [
+            credit_row("15.01.23", "REWE Filiale Muenchen", "-10,80 €"),
+            credit_row(
+                "14.01.23", "Ausgleich Kreditkarte gem", "138,98", "Lastschrift"
+            ),
+        ],
+        balance_date="31.01.2023",
+    )
+
+
+def test_ec_stats(ec_file):
+    stats = ExtractionStats()
+    importer = ECImporter(
+        IBAN,
+        "Assets:DKB:EC",
+        payee_patterns=[("EDEKA", "Expenses:Supermarket")],
+        iban_matcher=[("DE00000000000000000000", "Assets:Savings")],
+        stats=stats,
+    )
+
+    importer.extract(ec_file)
+
+    # served from the cache, so not counted again
+    importer.extract(ec_file)
+
+    assert len(stats.files) == 1
+
+    file_stats = stats.files[0]
+
+    assert file_stats.filepath == ec_file
+    assert file_stats.rows == 3
+    assert file_stats.rows_skipped == 0
+    # matching stops at the first hit, so payee_patterns isn't tried for the rows
+    # matched by iban_matcher
+    assert file_stats.matcher_hits == {
+        "iban_matcher": {"DE00000000000000000000": 2},
+    }
+    assert set(file_stats.phases) == set(PHASES)
+    assert all(seconds >= 0 for seconds in file_stats.phases.values())
+
+
+def test_credit_stats_count_skipped_rows(credit_file):
+    stats = ExtractionStats()
+    importer = CreditImporter(
+        CARD_NUMBER,
+        "Assets:DKB:Credit",
+        description_patterns=[("REWE", "Expenses:Supermarket")],
+        ignore_credit_card_settlements=True,
+        stats=stats,
+    )
+
+    assert len(importer.extract(credit_file)) == 2
+
+    file_stats = stats.files[0]
+
+    assert file_stats.rows == 2
+    assert file_stats.rows_skipped == 1
+    assert file_stats.matcher_hits == {"description_patterns": {"REWE": 1}}
+
+
+def test_stats_to_json(credit_file):
+    stats = ExtractionStats()
+    importer = CreditImporter(CARD_NUMBER, "Assets:DKB:Credit", stats=stats)
+
+    importer.extract(credit_file)
+
+    result = json.loads(stats.to_json())
+
+    assert result["totals"]["files"] == 1
+    assert result["totals"]["rows"] == 2
+    assert result["files"][0]["filepath"] == str(credit_file)
+    assert set(result["files"][0]["phases"]) == set(PHASES)
+
+
+def test_timed_does_not_count_nested_time_twice():
+    file_stats = FileStats("export.csv")
+
+    def slow_lines():
+        for line in ("a", "b"):
+            time.sleep(0.01)
+            yield line
+
+    rows = file_stats.timed(file_stats.timed(slow_lines(), "read"), "csv")
+
+    assert list(rows) == ["a", "b"]
+    assert file_stats.phases["read"] >= 0.02
+    assert file_stats.phases["csv"] < 0.01
@@ -0,0 +1,253 @@
+import json
+
+import pytest
+from beancount.core.data import Balance, Transaction
+from conftest import (
+    CARD_NUMBER,
+    IBAN,
+    credit_row,
+    ec_row,
+    write_credit_export,
+    write_ec_export,
+)
+
+from beancount_dkb import CreditImporter, ECImporter
+from beancount_dkb.watermark import WatermarkStore
+
+
+def _transactions(entries):
+    return [entry for entry in entries if isinstance(entry, Transaction)]
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return tmp_path / "watermark.json"
+
+
+def test_overlapping_exports(tmp_path, store_path):
+    importer = ECImporter(IBAN, "Assets:DKB:EC", watermark=WatermarkStore(store_path))
+
+    first = write_ec_export(
+        tmp_path / "first.csv", [ec_row("15.06.23"), ec_row("14.06.23", "REWE")]
+    )
+    second = write_ec_export(
+        tmp_path / "second.csv",
+        [
+            ec_row("20.06.23", "LIDL"),
+            ec_row("15.06.23"),
+            ec_row("14.06.23", "REWE"),
+        ],
+    )
+
+    assert len(_transactions(importer.extract(first))) == 2
+
+    entries = importer.extract(second)
+
+    assert [entry.payee for entry in _transactions(entries)] == ["LIDL"]
+    assert isinstance(entries[-1], Balance)
+
+    assert _transactions(importer.extract(second)) == []
+
+
+def test_identical_rows_are_counted(tmp_path, store_path):
+    importer = ECImporter(IBAN, "Assets:DKB:EC", watermark=WatermarkStore(store_path))
+
+    first = write_ec_export(tmp_path / "first.csv", [ec_row("15.06.23")] * 2)
+    second = write_ec_export(tmp_path / "second.csv", [ec_row("15.06.23")] * 3)
+
+    assert len(_transactions(importer.extract(first))) == 2
+    assert len(_transactions(importer.extract(second))) == 1
+
+
+@pytest.mark.parametrize("content", [None, "not json", '{"version": 99}'])
+def test_missing_or_unreadable_store_falls_back_to_full_extraction(
+    tmp_path, store_path, content
+):
+    export = write_ec_export(tmp_path / "export.csv", [ec_row("15.06.23")])
+
+    store = WatermarkStore(store_path)
+    ECImporter(IBAN, "Assets:DKB:EC", watermark=store).extract(export)
+    store.save()
+
+    if content is None:
+        store_path.unlink()
+    else:
+        store_path.write_text(content)
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC", watermark=WatermarkStore(store_path))
+
+    if content is None:
+        entries = importer.extract(export)
+    else:
+        with pytest.warns(UserWarning, match="unreadable watermark store"):
+            entries = importer.extract(export)
+
+    assert len(_transactions(entries)) == 1
+
+
+def test_old_rows_are_pruned_and_skipped(tmp_path, store_path):
+    store = WatermarkStore(store_path, retention_days=10)
+    importer = ECImporter(IBAN, "Assets:DKB:EC", watermark=store)
+
+    first = write_ec_export(tmp_path / "first.csv", [ec_row("01.06.23")])
+    second = write_ec_export(
+        tmp_path / "second.csv", [ec_row("20.06.23"), ec_row("02.06.23", "REWE")]
+    )
+
+    importer.extract(first)
+
+    assert len(_transactions(importer.extract(second))) == 2
+
+    store.save()
+    rows = json.loads(store_path.read_text())["accounts"][f"iban:{IBAN}"]["rows"]
+
+    # rows more than 10 days before the latest row, 20.06.23, are pruned
+    assert list(rows.values()) == ["2023-06-20"]
+
+    # ... but still skipped
+    assert _transactions(importer.extract(second)) == []
+
+
+def test_older_archive_is_imported_after_recent_exports(tmp_path, store_path):
+    importer = ECImporter(
+        IBAN,
+        "Assets:DKB:EC",
+        watermark=WatermarkStore(store_path, retention_days=10),
+    )
+
+    weekly = write_ec_export(
+        tmp_path / "weekly.csv", [ec_row("20.06.23"), ec_row("15.06.23", "REWE")]
+    )
+    archive = write_ec_export(
+        tmp_path / "archive.csv",
+        [
+            ec_row("15.06.23", "REWE"),
+            ec_row("01.06.23", "LIDL"),
+            ec_row("01.05.23", "ALDI"),
+        ],
+    )
+
+    assert len(_transactions(importer.extract(weekly))) == 2
+
+    # the archive rows are older than the horizon, but were never imported
+    entries = importer.extract(archive)
+
+    assert [entry.payee for entry in _transactions(entries)] == ["LIDL", "ALDI"]
+    assert _transactions(importer.extract(archive)) == []
+    assert _transactions(importer.extract(weekly)) == []
+
+
+def test_gap_between_imported_exports_is_extracted(tmp_path, store_path):
+    store = WatermarkStore(store_path)
+    importer = ECImporter(IBAN, "Assets:DKB:EC", watermark=store)
+
+    january = write_ec_export(tmp_path / "january.csv", [ec_row("15.01.23")])
+    june = write_ec_export(tmp_path / "june.csv", [ec_row("15.06.24", "REWE")])
+    march = write_ec_export(tmp_path / "march.csv", [ec_row("15.03.23", "LIDL")])
+
+    assert len(_transactions(importer.extract(january))) == 1
+    assert len(_transactions(importer.extract(june))) == 1
+
+    # 15.03.23 is older than the horizon, but no export covering it was imported
+    entries = importer.extract(march)
+
+    assert [entry.payee for entry in _transactions(entries)] == ["LIDL"]
+
+    store.save()
+    ranges = json.loads(store_path.read_text())["accounts"][f"iban:{IBAN}"]["ranges"]
+
+    assert ranges == [
+        ["2023-01-15", "2023-01-15"],
+        ["2023-03-15", "2023-03-15"],
+        ["2024-06-15", "2024-06-15"],
+    ]
+
+
+def test_rows_are_only_recorded_on_save(tmp_path, store_path):
+    store = WatermarkStore(store_path)
+    importer = ECImporter(IBAN, "Assets:DKB:EC", watermark=store)
+
+    export = write_ec_export(tmp_path / "export.csv", [ec_row("15.06.23")])
+
+    assert len(_transactions(importer.extract(export))) == 1
+
+    # e.g. a dry run
+    assert not store_path.exists()
+
+    # the rows are still skipped within the same run
+    assert _transactions(importer.extract(export)) == []
+
+    store.save()
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC", watermark=WatermarkStore(store_path))
+
+    assert _transactions(importer.extract(export)) == []
+
+
+def test_autosave(tmp_path, store_path):
+    importer = ECImporter(
+        IBAN, "Assets:DKB:EC", watermark=WatermarkStore(store_path, autosave=True)
+    )
+
+    export = write_ec_export(tmp_path / "export.csv", [ec_row("15.06.23")])
+
+    assert len(_transactions(importer.extract(export))) == 1
+
+    importer = ECImporter(IBAN, "Assets:DKB:EC", watermark=WatermarkStore(store_path))
+
+    assert _transactions(importer.extract(export)) == []
+
+
+def test_version_1_store_keeps_fingerprints_only(tmp_path, store_path):
+    export = write_ec_export(
+        tmp_path / "export.csv", [ec_row("15.06.23"), ec_row("01.03.23", "REWE")]
+    )
+
+    store = WatermarkStore(store_path)
+    ECImporter(IBAN, "Assets:DKB:EC", watermark=store).extract(export)
+    store.save()
+
+    account = json.loads(store_path.read_text())["accounts"][f"iban:{IBAN}"]
+    store_path.write_text(
+        json.dumps(
+            {
+                "version": 1,
+                "accounts": {
+                    f"iban:{IBAN}": {
+                        "oldest": "2023-01-01",
+                        "latest": account["latest"],
+                        "rows": account["rows"],
+                    }
+                },
+            }
+        )
+    )
+
+    importer = ECImporter(
+        IBAN,
+        "Assets:DKB:EC",
+        watermark=WatermarkStore(store_path, retention_days=10),
+    )
+
+    # the rows are still known by their fingerprints
+    assert _transactions(importer.extract(export)) == []
+
+    # ... but dates between oldest and latest aren't taken as imported
+    other = write_ec_export(tmp_path / "other.csv", [ec_row("01.02.23", "LIDL")])
+
+    assert len(_transactions(importer.extract(other))) == 1
+
+
+def test_credit_importer(tmp_path, store_path):
+    tmp_file = write_credit_export(
+        tmp_path / "credit.csv",
+        [credit_row("15.01.23", "REWE Filiale Muenchen", "-10,80 €")],
+        balance_date="31.01.2023",
+    )
+
+    importer = CreditImporter(
+        CARD_NUMBER, "Assets:DKB:Credit", watermark=WatermarkStore(store_path)
+    )
+
+    assert len(_transactions(importer.extract(tmp_file))) == 1
+    assert len(_transactions(importer.extract(tmp_file))) == 0